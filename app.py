@@ -1,25 +1,54 @@
 from flask import Flask, render_template, request, redirect, url_for, session, jsonify
 import os
 import re
-import requests
-import base64
-import io
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from datetime import datetime
-from database import db
+
+# Before the local imports below: database, logging and cache settings
+# are read from the environment when those modules load
+load_dotenv()
+
+from database import db, Database
+from summary import safe_float, fy_contributions, summary_for_year
+from http_cache import versioned_response, response_cache
+from ocr_jobs import ocr_jobs, QueueFull
+from ocr_cache import ocr_cache, content_key
+from ocr_engines import build_router, OcrError
+from image_prep import prepare_for_ocr, OCR_PREPROCESS, OCR_MAX_EDGE, OCR_JPEG_QUALITY
+from uploads import (read_upload, read_uploads, expand_archives, close_uploads,
+                     UploadError, LimitedRequest)
+import pdf_pages
+from pdf_pages import PdfError
+import metrics
+from fiscal_calendar import (
+    month_key as make_month_key,
+    month_ordinal,
+    sort_months,
+    group_by_financial_year,
+    MONTH_NUMBERS
+)
 from authlib.integrations.flask_client import OAuth
-from authlib.common.security import generate_token
-from PIL import Image
 import secrets
+import click
+import logging
+from logging_config import get_logger
 
-load_dotenv()
+log = get_logger('app')
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-key-change-this')
+# Lets the upload endpoints cap their own request bodies
+app.request_class = LimitedRequest
 
-# OCR.space API configuration
-OCR_SPACE_API_KEY = os.getenv('OCR_SPACE_API_KEY')
+# OCR configuration (engines and OCR.space settings: see ocr_engines.py)
+# Scanned pages of one PDF OCRed at once
+OCR_PAGE_WORKERS = int(os.getenv('OCR_PAGE_WORKERS', '3'))
+# Files of one batch analyzed at once
+OCR_BATCH_WORKERS = int(os.getenv('OCR_BATCH_WORKERS', '3'))
+# Every job worker can run a batch whose files each fan out to pages, so the
+# OCR.space pool holds that many connections. Calls beyond it (e.g. from
+# /analyze-payslip requests) wait for a free one
+ocr_router = build_router(pool_size=ocr_jobs.workers * OCR_BATCH_WORKERS * OCR_PAGE_WORKERS)
 
 # Session security
 app.config.update(
@@ -43,61 +72,59 @@ google = oauth.register(
     }
 )
 
+# ========== METRICS ==========
+# Registered first so the latency covers the other request hooks too
+metrics.init_app(app)
+
+metrics.instrument_storage(Database, (
+    'create_user', 'get_user', 'verify_user',
+    'save_monthly_record', 'save_monthly_records',
+    'get_user_monthly_data', 'get_user_yearly_summary',
+    'get_available_financial_years', 'get_all_months_list',
+    'update_monthly_investments', 'save_tax_analysis',
+    'get_data_version', 'get_fy_aggregates'
+))
+
+def _pool_connections():
+    stats = db.pool_stats()
+    return {(state,): stats[state] for state in ('in_use', 'idle', 'max') if state in stats}
+
+def _pool_events():
+    stats = db.pool_stats()
+    return {(event,): stats[event]
+            for event in ('borrowed', 'reused', 'waits', 'timeouts', 'discarded') if event in stats}
+
+metrics.register_gauge("db_pool_connections", "PostgreSQL pool connections by state",
+                       ("state",), _pool_connections)
+metrics.register_gauge("db_pool_events_total", "PostgreSQL pool borrow events",
+                       ("event",), _pool_events, metric_type="counter")
+metrics.register_gauge("response_cache_events_total", "Dashboard response cache lookups",
+                       ("result",), lambda: {("hit",): response_cache.stats()["hits"],
+                                             ("miss",): response_cache.stats()["misses"]},
+                       metric_type="counter")
+metrics.register_gauge("response_cache_entries", "Dashboard responses held in the cache",
+                       (), lambda: {(): response_cache.stats()["entries"]})
+metrics.register_gauge("ocr_cache_events_total", "OCR result cache lookups",
+                       ("result",), lambda: {("hit",): ocr_cache.stats()["hits"],
+                                             ("disk_hit",): ocr_cache.stats()["disk_hits"],
+                                             ("miss",): ocr_cache.stats()["misses"]},
+                       metric_type="counter")
+metrics.register_gauge("ocr_cache_entries", "OCR results held in memory",
+                       (), lambda: {(): ocr_cache.stats()["entries"]})
+metrics.register_gauge("ocr_jobs", "OCR jobs held by this worker, by status",
+                       ("status",), lambda: {(status,): count for status, count in ocr_jobs.stats().items()})
+metrics.register_gauge("ocr_engine_latency_seconds", "Recent average OCR call time per engine",
+                       ("engine",), lambda: {(name,): engine["latency"] for name, engine in ocr_router.stats().items()
+                                             if engine["latency"] is not None})
+metrics.register_gauge("ocr_engine_demoted", "1 while an OCR engine is tried last for being slow or failing",
+                       ("engine",), lambda: {(name,): int(engine["demoted"]) for name, engine in ocr_router.stats().items()})
+
 # Login attempts tracking
 login_attempts = {}
 
-# ========== HELPER FUNCTIONS ==========
-def calculate_financial_year(month_key):
-    """Convert month name to financial year (e.g., 'April 2025' -> '2025-26')"""
-    try:
-        if not month_key:
-            return None
-            
-        parts = month_key.split()
-        if len(parts) == 2:
-            month = parts[0]
-            year = int(parts[1])
-            
-            months = {
-                'January': 1, 'February': 2, 'March': 3, 'April': 4,
-                'May': 5, 'June': 6, 'July': 7, 'August': 8,
-                'September': 9, 'October': 10, 'November': 11, 'December': 12
-            }
-            
-            month_num = months.get(month, 0)
-            
-            if month_num >= 4:
-                return f"{year}-{str(year+1)[-2:]}"
-            else:
-                return f"{year-1}-{str(year)[-2:]}"
-    except Exception as e:
-        print(f"Error calculating financial year for {month_key}: {e}")
-    
-    return None
-
-def safe_float(value):
-    """Safely convert any value to float"""
-    try:
-        if value is None:
-            return 0.0
-        if isinstance(value, (int, float)):
-            return float(value)
-        if isinstance(value, str):
-            value = value.replace(',', '').strip()
-            return float(value) if value else 0.0
-        return 0.0
-    except (ValueError, TypeError, AttributeError):
-        return 0.0
-
-def calculate_trend(incomes):
-    """Calculate percentage trend in income"""
-    if len(incomes) < 2:
-        return 0
-    first_avg = sum(incomes[:3]) / min(3, len(incomes))
-    last_avg = sum(incomes[-3:]) / min(3, len(incomes))
-    if first_avg == 0:
-        return 0
-    return round(((last_avg - first_avg) / first_avg) * 100)
+# ETag / 304 / response cache for the dashboard read APIs, keyed by the
+# user's data version (looked up through the module-level db at call time)
+cached_by_data_version = versioned_response(lambda email: db.get_data_version(email))
 
 # ========== HOME ROUTE ==========
 @app.route('/')
@@ -108,6 +135,7 @@ def index():
 
 # ========== PHASE 5 - FINANCIAL DASHBOARD API WITH YEAR SELECTION ==========
 @app.route('/api/financial-summary')
+@cached_by_data_version
 def financial_summary():
     if 'user_email' not in session:
         return jsonify({"success": False, "error": "Unauthorized"}), 401
@@ -117,222 +145,99 @@ def financial_summary():
         
         # Get year from query parameter (e.g., ?year=2025-26)
         selected_year = request.args.get('year', None)
-        print(f"📅 Selected financial year: {selected_year}")
+        log.debug("📅 Selected financial year: %s", selected_year)
         
-        # Get ALL monthly data first
-        all_monthly_data = db.get_user_monthly_data(user_email)
+        # Per-month contributions, kept up to date by the database on every save
+        aggregates = db.get_fy_aggregates(user_email)
+        result = summary_for_year(aggregates, selected_year)
         
-        if not all_monthly_data:
-            return jsonify({
-                "success": True,
-                "summary": {
-                    "totalIncome": 0,
-                    "totalTax": 0,
-                    "taxSaved": 0,
-                    "monthsTracked": 0,
-                    "trend": 0
-                },
-                "monthlyData": {
-                    "months": [],
-                    "incomes": [],
-                    "takeHome": 0,
-                    "tds": 0,
-                    "pf": 0,
-                    "otherDeductions": 0
-                },
-                "savings": {
-                    "invested80C": 0,
-                    "invested80D": 0
-                }
-            })
+        log.debug("🎯 Summary for %s: %d months",
+                  selected_year or 'All Years', result['summary']['monthsTracked'])
         
-        print(f"📊 Total months found: {len(all_monthly_data)}")
+        return jsonify({"success": True, **result})
         
-        # Filter months by selected financial year if provided
-        filtered_data = {}
-        months_list = []
+    except Exception as e:
+        log.exception("❌ Dashboard error")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# ========== DASHBOARD BOOTSTRAP ==========
+@app.route('/api/dashboard-bootstrap')
+@cached_by_data_version
+def dashboard_bootstrap():
+    """Years, months, summary and every month's details for the dashboard, from one read"""
+    if 'user_email' not in session:
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    
+    try:
+        user_email = session['user_email']
         
-        for month_key, data in all_monthly_data.items():
-            financial_year = data.get('financial_year', None)
-            
-            if not financial_year:
-                financial_year = calculate_financial_year(month_key)
-            
-            print(f"📅 Month: {month_key} -> Financial Year: {financial_year}")
-            
-            if selected_year:
-                if financial_year == selected_year:
-                    filtered_data[month_key] = data
-                    months_list.append(month_key)
-                    print(f"✅ Including {month_key} in {selected_year}")
-            else:
-                filtered_data[month_key] = data
-                months_list.append(month_key)
-        
-        monthly_data = filtered_data
-        
-        print(f"📊 After filtering - Months to process: {months_list}")
-        
-        # Initialize variables for calculations
-        incomes_list = []
-        total_take_home = 0
-        total_tds = 0
-        total_pf = 0
-        total_other = 0
-        total_80c_investment = 0  # Actual PPF + ELSS invested
-        total_80d_investment = 0  # Actual Insurance premium paid
-        total_tax_saved = 0       # Total refund from tax_analysis
-        total_hra_benefit = 0     # HRA refund amount
-        
-        # Process each month's data
-        for month_key, data in monthly_data.items():
-            print(f"\n🔍 Processing month: {month_key}")
-            
-            income = safe_float(data.get('income', 0))
-            net_pay = safe_float(data.get('net_pay', 0))
-            tax_paid = safe_float(data.get('tax_paid', 0))
-            deductions = safe_float(data.get('deductions', 0))
-            
-            print(f"   Income: ₹{income}, Net Pay: ₹{net_pay}, Tax Paid: ₹{tax_paid}, Deductions: ₹{deductions}")
-            
-            incomes_list.append(income)
-            total_take_home += net_pay
-            total_tds += tax_paid
-            
-            if deductions > 0:
-                total_pf += deductions * 0.6
-                total_other += deductions * 0.4
-            
-            # ===== FIXED: Get investment data from tax_analysis.answers =====
-            if 'tax_analysis' in data and 'answers' in data['tax_analysis']:
-                answers = data['tax_analysis']['answers']
-                
-                # Get actual investment amounts from user inputs
-                ppf_val = safe_float(answers.get('ppf', 0))
-                elss_val = safe_float(answers.get('elss', 0))
-                insurance_val = safe_float(answers.get('insurance', 0))
-                
-                # Calculate 80C investment (PPF + ELSS)
-                month_80c = ppf_val + elss_val
-                total_80c_investment += month_80c
-                
-                # Calculate 80D investment (Insurance)
-                month_80d = insurance_val
-                total_80d_investment += month_80d
-                
-                # Get refund amounts from results
-                if 'results' in data['tax_analysis']:
-                    month_hra = safe_float(data['tax_analysis']['results'].get('hra', 0))
-                    total_hra_benefit += month_hra
-                    
-                    month_refund = safe_float(data['tax_analysis']['results'].get('total_refund', 0))
-                    total_tax_saved += month_refund
-                
-                print(f"   💰 From Tax Analyzer - 80C: ₹{month_80c}, 80D: ₹{month_80d}, HRA: ₹{month_hra if 'month_hra' in locals() else 0}")
-            
-            # Fallback to old investments structure if no tax_analysis
-            else:
-                investments = data.get('investments', {})
-                ppf_val = safe_float(investments.get('ppf', 0))
-                elss_val = safe_float(investments.get('elss', 0))
-                life_val = safe_float(investments.get('life_insurance', 0))
-                month_80c = ppf_val + elss_val + life_val
-                total_80c_investment += month_80c
-                
-                insurance = data.get('insurance', {})
-                self_val = safe_float(insurance.get('self', 0))
-                parents_val = safe_float(insurance.get('parents', 0))
-                month_80d = self_val + parents_val
-                total_80d_investment += month_80d
-                
-                print(f"   💰 From old structure - 80C: ₹{month_80c}, 80D: ₹{month_80d}")
-        
-        # If no tax_analysis data found, estimate tax saved
-        if total_tax_saved == 0:
-            total_tax_saved = (total_80c_investment * 0.3) + (total_80d_investment * 0.3) + total_hra_benefit
-            print(f"⚠️ Estimated tax saved: ₹{total_tax_saved}")
-        
-        # Calculate summary
-        summary = {
-            "totalIncome": sum(incomes_list),
-            "totalTax": total_tds,
-            "taxSaved": total_tax_saved,
-            "monthsTracked": len(months_list),
-            "trend": calculate_trend(incomes_list) if len(incomes_list) > 1 else 0
-        }
-        
-        monthly_data_response = {
-            "months": months_list,
-            "incomes": incomes_list,
-            "takeHome": total_take_home,
-            "tds": total_tds,
-            "pf": total_pf,
-            "otherDeductions": total_other
-        }
-        
-                # Calculate REFUND amounts (30% of investments) - matching calculate_tax_refund function
-        refund_80c = total_80c_investment * 0.3
-        refund_80d = total_80d_investment * 0.3
-        
-        savings = {
-            "invested80C": total_80c_investment,  # Investment amount (for display)
-            "invested80D": total_80d_investment,  # Investment amount (for display)
-            "refund80C": refund_80c,               # Refund amount (for progress bar)
-            "refund80D": refund_80d      
-        }
-        
-        print(f"\n🎯 FINAL RESULTS for {selected_year if selected_year else 'All Years'}:")
-        print(f"   Total Income: ₹{summary['totalIncome']}")
-        print(f"   Tax Saved: ₹{total_tax_saved}")
-        print(f"   Refund 80C: ₹{refund_80c} (from investment ₹{total_80c_investment})")
-        print(f"   Refund 80D: ₹{refund_80d} (from investment ₹{total_80d_investment})")
-        print(f"   Months: {months_list}")
+        # Summary for this year; the dashboard opens on all years
+        selected_year = request.args.get('year', '')
+        
+        monthly_data = db.get_user_monthly_data(user_email) or {}
+        aggregates = fy_contributions(monthly_data)
+        
+        log.debug("📊 Dashboard bootstrap: %d months", len(monthly_data))
         
         return jsonify({
             "success": True,
-            "summary": summary,
-            "monthlyData": monthly_data_response,
-            "savings": savings  # Now sends REFUND amounts!
+            "year": selected_year,
+            "years": sorted((fy for fy in aggregates if fy), reverse=True),
+            "months": sort_months(monthly_data),
+            **summary_for_year(aggregates, selected_year),
+            "monthDetails": monthly_data
         })
         
     except Exception as e:
-        print(f"❌ Dashboard error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Dashboard bootstrap error")
         return jsonify({"success": False, "error": str(e)}), 500
 
 # ========== SAVE PAYSLIP DATA ==========
+# Upper bound for one bulk save, a few years of payslips
+MAX_BULK_MONTHS = 120
+
+def build_month_data(data):
+    """Validate one payslip payload; returns (month_data, error)"""
+    if not isinstance(data, dict):
+        return None, "Invalid month entry"
+    
+    date_str = data.get('date', '')
+    month_key = extract_month_from_date(date_str)
+    
+    if not month_key:
+        return None, "Could not determine month"
+    
+    deductions_val = safe_float(data.get('deductions', 0))
+    
+    month_data = {
+        "month": month_key,
+        "income": safe_float(data.get('income', 0)),
+        "employer": data.get('employer', ''),
+        "date": date_str,
+        "deductions": deductions_val,
+        "net_pay": safe_float(data.get('net_pay', 0)),
+        "hra": {},
+        "investments": {},
+        "insurance": {},
+        "tax_paid": deductions_val * 0.3
+    }
+    return month_data, None
+
 @app.route('/api/save-monthly-data', methods=['POST'])
 def save_monthly_data():
     if 'user_email' not in session:
         return jsonify({"error": "Unauthorized"}), 401
     
     try:
-        data = request.json
         user_email = session['user_email']
         
-        date_str = data.get('date', '')
-        month_key = extract_month_from_date(date_str)
-        
-        if not month_key:
-            return jsonify({"success": False, "error": "Could not determine month"}), 400
+        month_data, error = build_month_data(request.json)
         
-        deductions_val = safe_float(data.get('deductions', 0))
+        if error:
+            return jsonify({"success": False, "error": error}), 400
         
-        month_data = {
-            "month": month_key,
-            "income": safe_float(data.get('income', 0)),
-            "employer": data.get('employer', ''),
-            "date": date_str,
-            "deductions": deductions_val,
-            "net_pay": safe_float(data.get('net_pay', 0)),
-            "hra": {},
-            "investments": {},
-            "insurance": {},
-            "tax_paid": deductions_val * 0.3
-        }
-        
-        print(f"💾 Saving month: {month_key} with data: {month_data}")
+        # Month only: the payload is the user's salary details
+        log.info("💾 Saving month: %s", month_data['month'])
         
         success, message = db.save_monthly_record(user_email, month_data)
         
@@ -342,9 +247,73 @@ def save_monthly_data():
             return jsonify({"success": False, "error": message}), 500
             
     except Exception as e:
-        print(f"❌ Save error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Save error")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def build_month_records(items):
+    """Validate many payslip payloads; returns (results, records to save).
+
+    results has one {"index", "success", "month" or "error"} per item.
+    """
+    results = []
+    records = []
+    seen = {}
+    for index, item in enumerate(items):
+        month_data, error = build_month_data(item)
+        if error:
+            results.append({"index": index, "success": False, "error": error})
+            continue
+        
+        # Same month twice: the later entry wins, like two single saves
+        month_key = month_data["month"]
+        if month_key in seen:
+            earlier = results[seen[month_key]]
+            earlier["success"] = False
+            earlier["error"] = "Replaced by a later entry for the same month"
+        seen[month_key] = len(results)
+        results.append({"index": index, "month": month_key, "success": True})
+        records.append(month_data)
+    return results, records
+
+@app.route('/api/save-monthly-data/bulk', methods=['POST'])
+def save_monthly_data_bulk():
+    """Save many months in one storage write, e.g. {"months": [{date, income, ...}, ...]}"""
+    if 'user_email' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    try:
+        user_email = session['user_email']
+        payload = request.json or {}
+        items = payload.get('months') if isinstance(payload, dict) else payload
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({"success": False, "error": "No months provided"}), 400
+        if len(items) > MAX_BULK_MONTHS:
+            return jsonify({"success": False, "error": f"At most {MAX_BULK_MONTHS} months per request"}), 400
+        
+        results, records = build_month_records(items)
+        
+        log.info("💾 Bulk saving %d months (%d rejected)", len(records), len(items) - len(records))
+        
+        if records:
+            success, message = db.save_monthly_records(user_email, records)
+            if not success:
+                for result in results:
+                    if result["success"]:
+                        result["success"] = False
+                        result["error"] = message
+                return jsonify({"success": False, "error": message, "results": results}), 500
+        
+        saved = sum(1 for result in results if result["success"])
+        return jsonify({
+            "success": saved > 0,
+            "saved": saved,
+            "failed": len(results) - saved,
+            "results": results
+        })
+        
+    except Exception as e:
+        log.exception("❌ Bulk save error")
         return jsonify({"success": False, "error": str(e)}), 500
 
 def extract_month_from_date(date_str):
@@ -353,54 +322,47 @@ def extract_month_from_date(date_str):
         if not date_str:
             return None
             
-        months = {
-            "01": "January", "02": "February", "03": "March", "04": "April",
-            "05": "May", "06": "June", "07": "July", "08": "August",
-            "09": "September", "10": "October", "11": "November", "12": "December"
-        }
-        
         # Check if it's already in "Month YYYY" format
         month_match = re.search(r'(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{4})', date_str, re.IGNORECASE)
         if month_match:
-            month_name = month_match.group(1)
-            year = month_match.group(2)
-            print(f"✅ Extracted month from text: {month_name} {year}")
-            return f"{month_name} {year}"
+            key = make_month_key(MONTH_NUMBERS[month_match.group(1).lower()], month_match.group(2))
+            log.debug("✅ Extracted month from text: %s", key)
+            return key
         
         # Check for DD/MM/YYYY or DD-MM-YYYY (with optional leading zeros)
         date_match = re.search(r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})', date_str)
         if date_match:
-            day = date_match.group(1)
-            month_num = date_match.group(2).zfill(2)
+            day = int(date_match.group(1))
+            month_num = int(date_match.group(2))
             year = date_match.group(3)
             
             # Handle case where month and day might be swapped (US format)
-            if int(month_num) > 12:
-                month_num = day.zfill(2)
+            if month_num > 12:
+                month_num = day
                 
-            if month_num in months:
-                month_name = months[month_num]
-                print(f"✅ Extracted month from date: {month_name} {year}")
-                return f"{month_name} {year}"
+            if 1 <= month_num <= 12:
+                key = make_month_key(month_num, year)
+                log.debug("✅ Extracted month from date: %s", key)
+                return key
         
         # Check for YYYY-MM-DD format
         date_match = re.search(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})', date_str)
         if date_match:
             year = date_match.group(1)
-            month_num = date_match.group(2).zfill(2)
-            day = date_match.group(3)
-            if month_num in months:
-                month_name = months[month_num]
-                print(f"✅ Extracted month from ISO date: {month_name} {year}")
-                return f"{month_name} {year}"
-        
-        print(f"❌ Could not extract month from: '{date_str}'")
+            month_num = int(date_match.group(2))
+            if 1 <= month_num <= 12:
+                key = make_month_key(month_num, year)
+                log.debug("✅ Extracted month from ISO date: %s", key)
+                return key
+        
+        log.debug("❌ Could not extract month from: %r", date_str)
         return None
     except Exception as e:
-        print(f"❌ Month extraction error: {str(e)}")
+        log.warning("❌ Month extraction error: %s", e)
         return None
 # ========== GET MONTHLY DATA ==========
 @app.route('/api/monthly-data/<month>')
+@cached_by_data_version
 def get_monthly_data(month):
     if 'user_email' not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -415,11 +377,12 @@ def get_monthly_data(month):
             return jsonify({"success": False, "error": "Month not found"}), 404
             
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        log.exception("❌ Error")
         return jsonify({"success": False, "error": str(e)}), 500
 
 # ========== GET ALL MONTHS LIST ==========
 @app.route('/api/months-list')
+@cached_by_data_version
 def get_months_list():
     if 'user_email' not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -429,11 +392,12 @@ def get_months_list():
         months = db.get_all_months_list(user_email)
         return jsonify({"success": True, "months": months})
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        log.exception("❌ Error")
         return jsonify({"success": False, "error": str(e)}), 500
 
 # ========== GET MONTHS LIST WITH FINANCIAL YEARS ==========
 @app.route('/api/months-with-years')
+@cached_by_data_version
 def get_months_with_years():
     """Get months grouped by financial year"""
     if 'user_email' not in session:
@@ -443,17 +407,7 @@ def get_months_with_years():
         user_email = session['user_email']
         monthly_data = db.get_user_monthly_data(user_email)
         
-        result = {}
-        
-        for month_key in monthly_data.keys():
-            financial_year = calculate_financial_year(month_key)
-            if financial_year:
-                if financial_year not in result:
-                    result[financial_year] = []
-                result[financial_year].append(month_key)
-        
-        for year in result:
-            result[year].sort(key=lambda x: datetime.strptime(x, "%B %Y"))
+        result = group_by_financial_year(monthly_data)
         
         return jsonify({
             "success": True,
@@ -461,11 +415,12 @@ def get_months_with_years():
         })
         
     except Exception as e:
-        print(f"Error: {str(e)}")
+        log.exception("❌ Error")
         return jsonify({"success": False, "error": str(e)}), 500
 
 # ========== GET AVAILABLE FINANCIAL YEARS ==========
 @app.route('/api/financial-years')
+@cached_by_data_version
 def get_financial_years():
     if 'user_email' not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -475,71 +430,371 @@ def get_financial_years():
         years = db.get_available_financial_years(user_email)
         return jsonify({"success": True, "years": years})
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        log.exception("❌ Error")
         return jsonify({"success": False, "error": str(e)}), 500
 
-# ========== OCR.SPACE PAYSLIP ANALYSIS ==========
+# ========== PAYSLIP OCR ==========
+def ocr_text(image_data):
+    """(text, engine name) from the first OCR engine that reads an image; raises OcrError if OCR fails"""
+    engine, pages = ocr_router.read(image_data)
+    extracted_text = "".join(pages)
+    log.debug("📝 %s extracted text length: %d chars", engine, len(extracted_text))
+    return extracted_text, engine
+
+# Engine name for PDFs read entirely from their text layer, without OCR
+TEXT_LAYER = 'text-layer'
+
+# What OCR is sent depends on these settings as well as on the upload, so
+# changing one of them makes older cached results a miss
+OCR_INPUT_SETTINGS = (f"{'prep' if OCR_PREPROCESS else 'raw'}{OCR_MAX_EDGE}"
+                      f"q{OCR_JPEG_QUALITY}dpi{pdf_pages.PDF_RENDER_DPI}")
+
+def ocr_cache_key(upload, engine):
+    # Keyed by the engine that actually read the upload, so a fallback (or
+    # fixture) result is never served as another engine's
+    return content_key(upload.sha256, f"{PARSER_VERSION}-{OCR_INPUT_SETTINGS}-{engine}")
+
+def cached_ocr(upload, engines):
+    """Cached result for an upload from the first of engines that has one, or None.
+
+    Pass the engine that would read the upload now (ocr_router.preferred()),
+    so a result from a fallback engine is only reused while that engine
+    would be answering anyway.
+    """
+    keys = [ocr_cache_key(upload, engine) for engine in engines if engine]
+    _, cached = ocr_cache.get_first(keys)
+    return cached
+
+def ocr_payslip_image(upload):
+    """OCR one uploads.Upload and parse it; raises OcrError if OCR fails.
+
+    Results are cached by image content, so a re-upload skips OCR.
+    """
+    cached = cached_ocr(upload, [ocr_router.preferred()])
+    if cached is not None:
+        log.debug("♻️ OCR cache hit")
+        return dict(cached["parsed"])
+    
+    prepared, prep_stats = prepare_for_ocr(upload.open(), upload.size)
+    metrics.ocr_preprocessed(prep_stats)
+    log.debug("🖼️ Preprocessed image %s: %d -> %d bytes in %.3fs", prep_stats["outcome"],
+              prep_stats["original_bytes"], prep_stats["sent_bytes"], prep_stats["seconds"])
+    
+    extracted_text, engine = ocr_text(prepared)
+    parsed_data = parse_payslip_text(extracted_text)
+    ocr_cache.put(ocr_cache_key(upload, engine), {"text": extracted_text, "parsed": parsed_data})
+    return dict(parsed_data)
+
+# ========== MULTI-PAGE PDF PAYSLIPS ==========
+def payslip_records(pages):
+    """One record per month from [(text, parsed)] pages in document order.
+
+    A page with a pay date starts that month (or adds to it, if the month
+    was seen before); pages without one, like a second page of deductions,
+    belong to the month before them. Leading undated pages go with the
+    first month. Each month's pages are parsed again together, so fields
+    split over pages are found.
+    """
+    months = {}
+    leading = []
+    current = None
+    for number, (text, parsed) in enumerate(pages, 1):
+        month = extract_month_from_date(parsed.get("date"))
+        if month:
+            current = months.setdefault(month, [])
+        if current is None:
+            leading.append((number, text))
+        else:
+            current.append((number, text))
+    
+    if not months:
+        months[None] = leading
+    else:
+        first = next(iter(months))
+        months[first][:0] = leading
+    
+    records = []
+    for month, month_pages in months.items():
+        record = parse_payslip_text(" ".join(text for _, text in month_pages))
+        record["month"] = month
+        record["pages"] = [number for number, _ in month_pages]
+        records.append(record)
+    return records
+
+def read_payslip_page(image_data):
+    text, engine = ocr_text(image_data)
+    return (text, parse_payslip_text(text)), engine
+
+def ocr_pdf_pages(upload, job=None):
+    """([(text, parsed)] for each page of a PDF upload, engine), reporting progress to the job.
+
+    engine is the least preferred OCR engine any page needed (TEXT_LAYER if
+    none did), so the document is cached as no better than its weakest page.
+    """
+    if not pdf_pages.available():
+        # Sent whole to an engine that reads PDFs itself, like OCR.space
+        # (its free tier stops after 3 pages)
+        engine, page_texts = ocr_router.read(upload.open(), 'payslip.pdf', 'PDF')
+        return [(text, parse_payslip_text(text)) for text in page_texts], engine
+    
+    pages = {}
+    futures = {}
+    engines = set()
+    page_count = 0
+    with ThreadPoolExecutor(max_workers=OCR_PAGE_WORKERS, thread_name_prefix='ocr-page') as pool:
+        try:
+            # Pages are read here, one at a time (pdfium isn't thread-safe);
+            # scanned ones go to the pool while the next page renders
+            for index, page_count, text, image in pdf_pages.iter_pages(upload.open()):
+                if job:
+                    job.check_cancelled()
+                if text is not None:
+                    pages[index] = (text, parse_payslip_text(text))
+                else:
+                    futures[pool.submit(read_payslip_page, image)] = index
+                if job:
+                    job.report(len(pages), page_count)
+            
+            for future in as_completed(futures):
+                pages[futures[future]], engine = future.result()
+                engines.add(engine)
+                if job:
+                    job.report(len(pages), page_count)
+                    job.check_cancelled()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    
+    log.debug("📄 PDF: %d pages, %d OCRed", page_count, len(futures))
+    engine = max(engines, key=ocr_router.names.index) if engines else TEXT_LAYER
+    return [pages[index] for index in range(page_count)], engine
+
+def ocr_payslip_document(upload, job=None):
+    """{"records": [...], "pages": n} for an image or PDF upload.
+
+    Images give one record. PDFs give one record per month found, each
+    with "month" and the 1-based "pages" it came from.
+    """
+    if not pdf_pages.is_pdf(upload.open()):
+        parsed_data = ocr_payslip_image(upload)
+        parsed_data["month"] = extract_month_from_date(parsed_data.get("date"))
+        parsed_data["pages"] = [1]
+        return {"records": [parsed_data], "pages": 1}
+    
+    # Pages are OCRed as images once split; without pdfium the PDF goes whole
+    filetype = None if pdf_pages.available() else 'PDF'
+    cached = cached_ocr(upload, [TEXT_LAYER, ocr_router.preferred(filetype)])
+    if cached is not None:
+        log.debug("♻️ OCR cache hit")
+        pages = [(text, parse_payslip_text(text)) for text in cached["page_texts"]]
+    else:
+        pages, engine = ocr_pdf_pages(upload, job)
+        ocr_cache.put(ocr_cache_key(upload, engine), {"page_texts": [text for text, _ in pages]})
+    
+    return {"records": payslip_records(pages), "pages": len(pages)}
+
+# Both OCR endpoints take the file as multipart/form-data (field 'file'), as
+# the raw request body, or as the older JSON {"image": "<base64 data URL>"}
 @app.route('/analyze-payslip', methods=['POST'])
 def analyze_payslip():
     if 'user_email' not in session:
         return jsonify({"error": "Unauthorized"}), 401
     
-    if not OCR_SPACE_API_KEY:
-        return jsonify({"success": False, "error": "OCR.space API not configured"}), 500
+    if not ocr_router.available():
+        return jsonify({"success": False, "error": "No OCR engine configured"}), 500
     
     try:
-        data = request.json
-        image_data = data.get('image')
-        
-        if not image_data:
-            return jsonify({"error": "No image provided"}), 400
-        
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
-        
-        image_bytes = base64.b64decode(image_data)
-        
-        response = requests.post(
-            'https://api.ocr.space/parse/image',
-            data={
-                'apikey': OCR_SPACE_API_KEY,
-                'language': 'eng',
-                'isOverlayRequired': False,
-                'detectOrientation': True,
-                'scale': True,
-                'OCREngine': '2'
-            },
-            files={'file': ('payslip.jpg', image_bytes)}
-        )
-        
-        ocr_result = response.json()
-        
-        if ocr_result.get('IsErroredOnProcessing'):
-            error_msg = ocr_result.get('ErrorMessage', ['Unknown error'])[0]
-            return jsonify({"success": False, "error": f"OCR failed: {error_msg}"}), 500
-        
-        extracted_text = ""
-        if 'ParsedResults' in ocr_result:
-            for page in ocr_result['ParsedResults']:
-                extracted_text += page['ParsedText']
-        
-        print(f"📝 Extracted text length: {len(extracted_text)} chars")
-        
-        parsed_data = parse_payslip_text(extracted_text)
+        with read_upload(request) as upload:
+            document = ocr_payslip_document(upload)
         
+        # "data" is the first (for an image, the only) month found
         return jsonify({
             "success": True,
-            "data": parsed_data
+            "data": document["records"][0],
+            **document
         })
         
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    except PdfError as e:
+        # Corrupt, encrypted or too many pages: a problem with the upload
+        return jsonify({"success": False, "error": str(e)}), 400
+    except OcrError as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    except Exception as e:
+        log.exception("❌ Analysis error")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# ========== OCR JOBS ==========
+# Same input as /analyze-payslip, but the OCR runs in ocr_jobs' pool and the
+# page polls for the result, so uploads don't tie up request threads
+def payslip_job(job, upload):
+    with upload:
+        document = ocr_payslip_document(upload, job)
+    return {"data": document["records"][0], **document}
+
+@app.route('/api/ocr-jobs', methods=['POST'])
+def submit_ocr_job():
+    if 'user_email' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    if not ocr_router.available():
+        return jsonify({"success": False, "error": "No OCR engine configured"}), 500
+    
+    upload = None
+    try:
+        upload = read_upload(request)
+        job = ocr_jobs.submit(session['user_email'], 'payslip', payslip_job, upload,
+                              cleanup=upload.close)
+        log.debug("📥 OCR job %s queued", job.id)
+        return jsonify({"success": True, **job.to_dict()}), 202
+        
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    except QueueFull:
+        upload.close()
+        response = jsonify({"success": False, "error": "Too many payslips being analyzed, try again shortly"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except Exception as e:
+        log.exception("❌ OCR job submit error")
+        if upload is not None:
+            upload.close()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/ocr-jobs/<job_id>')
+def get_ocr_job(job_id):
+    if 'user_email' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    job = ocr_jobs.get(job_id, session['user_email'])
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, **job.to_dict()})
+
+@app.route('/api/ocr-jobs/<job_id>', methods=['DELETE'])
+def cancel_ocr_job(job_id):
+    if 'user_email' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    job = ocr_jobs.cancel(job_id, session['user_email'])
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, **job.to_dict()})
+
+# ========== BATCH PAYSLIP ANALYSIS ==========
+def read_batch_file(upload):
+    with upload:
+        return ocr_payslip_document(upload)
+
+def batch_job(job, uploads, auto_save):
+    """Analyze every file (ZIPs unpacked), keep one record per month, optionally save them"""
+    entries = expand_archives(uploads)
+    files = [{"file": name, "success": False, "months": []} for name, _ in entries]
+    found = []
+    done = 0
+    
+    futures = {}
+    with ThreadPoolExecutor(max_workers=OCR_BATCH_WORKERS, thread_name_prefix='ocr-batch') as pool:
+        for index, (name, entry) in enumerate(entries):
+            if isinstance(entry, UploadError):
+                files[index]["error"] = str(entry)
+                done += 1
+            else:
+                futures[pool.submit(read_batch_file, entry)] = index
+        job.report(done, len(entries))
+        
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    document = future.result()
+                except (OcrError, PdfError) as e:
+                    files[index]["error"] = str(e)
+                except Exception:
+                    log.exception("❌ Batch file error")
+                    # Only OcrError/PdfError messages are meant for the user
+                    files[index]["error"] = "Something went wrong analyzing this file"
+                else:
+                    files[index]["success"] = True
+                    files[index]["pages"] = document["pages"]
+                    found.extend((index, record) for record in document["records"])
+                done += 1
+                job.report(done, len(entries))
+                job.check_cancelled()
+        except BaseException:
+            for future, index in futures.items():
+                if future.cancel():
+                    entries[index][1].close()
+            raise
+    
+    # Batch order, then page order within a file, so a later file wins a month
+    found.sort(key=lambda item: item[0])
+    results, records = build_month_records([record for _, record in found])
+    months = {}
+    for (index, record), result in zip(found, results):
+        report = {"month": result.get("month") or record.get("month"), "used": result["success"]}
+        if not result["success"]:
+            report["reason"] = result["error"]
+        else:
+            months[result["month"]] = record
+        files[index]["months"].append(report)
+    
+    batch = {
+        "files": files,
+        "records": [months[month] for month in sort_months(months)],
+        "saved": None
+    }
+    
+    if auto_save and records:
+        # One storage write for the whole batch
+        job.check_cancelled()
+        success, message = db.save_monthly_records(job.owner, records)
+        if not success:
+            raise OcrError(f"Analyzed {len(months)} months but saving failed: {message}")
+        batch["saved"] = len(months)
+        log.info("💾 Batch saved %d months from %d files", len(months), len(files))
+    return batch
+
+@app.route('/api/ocr-jobs/batch', methods=['POST'])
+def submit_batch_job():
+    """Analyze several payslips (multipart 'files', or a ZIP) as one job; ?save=1 saves every month found"""
+    if 'user_email' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    if not ocr_router.available():
+        return jsonify({"success": False, "error": "No OCR engine configured"}), 500
+    
+    uploads = []
+    try:
+        auto_save = (request.args.get('save') or request.form.get('save') or '').lower() in ('1', 'true', 'yes')
+        uploads = read_uploads(request)
+        job = ocr_jobs.submit(session['user_email'], 'batch', batch_job, uploads, auto_save,
+                              cleanup=lambda: close_uploads(uploads))
+        log.debug("📥 Batch job %s queued with %d uploads", job.id, len(uploads))
+        return jsonify({"success": True, **job.to_dict()}), 202
+        
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    except QueueFull:
+        close_uploads(uploads)
+        response = jsonify({"success": False, "error": "Too many payslips being analyzed, try again shortly"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
     except Exception as e:
-        print(f"❌ Analysis error: {str(e)}")
+        log.exception("❌ Batch job submit error")
+        close_uploads(uploads)
         return jsonify({"success": False, "error": str(e)}), 500
 
+# Bump when parse_payslip_text (or what is sent to OCR) changes, so cached
+# results from the old version are not reused
+PARSER_VERSION = 2
+
 def parse_payslip_text(text):
     """Extract structured data from raw OCR text"""
     
-    print("🔍 Parsing payslip text...")
+    log.debug("🔍 Parsing payslip text")
     
     result = {
         "name": None,
@@ -593,7 +848,9 @@ def parse_payslip_text(text):
         if result[field] and result[field] > 1000000:
             result[field] = None
     
-    print(f"✅ Parsed result: {result}")
+    # Field names only; the values are salary details
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("✅ Parsed fields: %s", [field for field, value in result.items() if value is not None])
     return result
 
 # ========== GOOGLE LOGIN ROUTES ==========
@@ -601,33 +858,29 @@ def parse_payslip_text(text):
 def google_login():
     state = secrets.token_urlsafe(16)
     session['oauth_state'] = state
-    print(f"🔐 Generated state: {state}")
     
     # Get the base URL from the request (works everywhere)
     base_url = request.url_root.rstrip('/')
     redirect_uri = f"{base_url}/google/auth"
     
-    print(f"🔄 Redirect URI: {redirect_uri}")
+    log.debug("🔄 Redirect URI: %s", redirect_uri)
     
     return google.authorize_redirect(redirect_uri, state=state)
 
 @app.route('/google/auth')
 def google_auth():
     try:
-        print("=== Google Auth Callback Started ===")
+        log.debug("Google auth callback started")
         
         saved_state = session.get('oauth_state')
         received_state = request.args.get('state')
         
-        print(f"📌 Saved state: {saved_state}")
-        print(f"📌 Received state: {received_state}")
-        
         if not saved_state or saved_state != received_state:
-            print("❌ State mismatch")
+            log.warning("❌ OAuth state mismatch")
             return render_template('login.html', error="Security verification failed. Please try again.")
         
         token = google.authorize_access_token()
-        print("✅ Token received")
+        log.debug("✅ Token received")
         
         user_info = google.userinfo()
         
@@ -636,16 +889,14 @@ def google_auth():
         
         email = user_info.get('email')
         if not email:
-            print("❌ No email received")
+            log.warning("❌ No email received from Google")
             return render_template('login.html', error="Could not get email from Google")
         
         name = user_info.get('name', email.split('@')[0])
-        print(f"👤 User: {name} ({email})")
-        
         user = db.get_user(email)
         
         if not user:
-            print("🆕 Creating new user")
+            log.info("🆕 Creating new Google user")
             success, message = db.create_user(
                 email=email,
                 password='GOOGLE_AUTH_USER',
@@ -660,13 +911,11 @@ def google_auth():
         
         session.pop('oauth_state', None)
         
-        print("✅ Login successful")
+        log.info("✅ Google login successful")
         return redirect(url_for('dashboard'))
         
     except Exception as e:
-        print(f"❌ Google auth error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Google auth error")
         return render_template('login.html', error=f"Google login failed: {str(e)}")
 
 # ========== AUTH ROUTES ==========
@@ -771,12 +1020,13 @@ def dev_login():
 # ========== UTILITY ROUTES ==========
 @app.route('/test-ocr')
 def test_ocr():
-    if not OCR_SPACE_API_KEY:
-        return "❌ OCR.space API key not configured in .env"
-    return "✅ OCR.space API key is configured!"
+    if not ocr_router.available():
+        return f"❌ No OCR engine available (configured: {ocr_router.engine_list})"
+    return f"✅ OCR engines: {ocr_router.engine_list}"
 
 # ========== PHASE 6 - TAX ANALYZER API ==========
 @app.route('/api/month-tax/<month>')
+@cached_by_data_version
 def get_month_tax(month):
     """Get saved tax calculation for a month"""
     if 'user_email' not in session:
@@ -806,7 +1056,7 @@ def get_month_tax(month):
             })
             
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        log.exception("❌ Error")
         return jsonify({"success": False, "error": str(e)}), 500
 
 
@@ -834,7 +1084,7 @@ def calculate_tax():
         })
         
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        log.exception("❌ Error")
         return jsonify({"success": False, "error": str(e)}), 500
 
 
@@ -868,29 +1118,94 @@ def calculate_tax_refund(income, answers):
 
 def save_tax_calculation(user_email, month, answers, results):
     """Save tax calculation to database"""
-    data = db._load()
-    
-    if user_email not in data["users"]:
-        return
-    
-    if "financial_data" not in data["users"][user_email]:
-        data["users"][user_email]["financial_data"] = {}
+    return db.save_tax_analysis(user_email, month, answers, results)
+
+
+# ========== MONTH DATA WITH TAX ANALYSIS ==========
+def month_with_tax(month, month_data):
+    """One month's payslip data plus its completed tax analysis, if any"""
+    tax_data = month_data.get('tax_analysis', {})
+    completed = bool(tax_data) and tax_data.get('status') == 'completed'
+    return {
+        "month": month,
+        "data": month_data,
+        "has_tax_analysis": completed,
+        "tax_analysis": tax_data if completed else None
+    }
+
+@app.route('/api/month-with-tax/<month>')
+@cached_by_data_version
+def get_month_with_tax(month):
+    """Payslip data and tax analysis for one month, from one read"""
+    if 'user_email' not in session:
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
     
-    if month not in data["users"][user_email]["financial_data"]:
-        data["users"][user_email]["financial_data"][month] = {}
+    try:
+        month_data = db.get_user_monthly_data(session['user_email'], month)
+        
+        if not month_data:
+            return jsonify({"success": False, "error": "Month not found"}), 404
+        
+        return jsonify({"success": True, **month_with_tax(month, month_data)})
+        
+    except Exception as e:
+        log.exception("❌ Error")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/month-with-tax')
+@cached_by_data_version
+def get_months_with_tax():
+    """Payslip data and tax analysis for every saved month in ?from=...&to=... (inclusive)"""
+    if 'user_email' not in session:
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
     
-    data["users"][user_email]["financial_data"][month]["tax_analysis"] = {
-        "status": "completed",
-        "last_calculated": datetime.now().isoformat(),
-        "answers": answers,
-        "results": results
-    }
+    start = month_ordinal(request.args.get('from', ''))
+    end = month_ordinal(request.args.get('to', ''))
+    if start is None or end is None:
+        return jsonify({"success": False, "error": "from and to must be months like 'April 2025'"}), 400
     
-    db._save(data)
+    try:
+        monthly_data = db.get_user_monthly_data(session['user_email']) or {}
+        
+        months = [
+            month_with_tax(month, monthly_data[month])
+            for month in sort_months(monthly_data)
+            if month_ordinal(month) is not None and start <= month_ordinal(month) <= end
+        ]
+        
+        return jsonify({"success": True, "months": months})
+        
+    except Exception as e:
+        log.exception("❌ Error")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# ========== CLI COMMANDS ==========
+@app.cli.command('migrate-monthly-records')
+def migrate_monthly_records():
+    """Move legacy users.financial_data blobs into the monthly_records table"""
+    migrated = db.migrate_financial_data()
+    print(f"✅ Migrated {migrated} users")
+
+@app.cli.command('import-json-database')
+@click.argument('json_file', default='database.json')
+def import_json_database(json_file):
+    """Copy users and months from a database.json file into the SQLite or sharded backend"""
+    if db.backend not in ('sqlite', 'sharded'):
+        print("❌ Set DB_BACKEND=sqlite or DB_BACKEND=sharded to import")
+        return
+    imported = db.import_json_file(json_file)
+    print(f"✅ Imported {imported} users from {json_file}")
+
+@app.cli.command('rebuild-aggregates')
+@click.argument('email', required=False)
+def rebuild_aggregates(email):
+    """Recompute the per-financial-year dashboard aggregates (one user, or everyone)"""
+    rebuilt = db.rebuild_fy_aggregates(email)
+    print(f"✅ Rebuilt aggregates for {rebuilt} users")
 
 
 if __name__ == '__main__':
     print("🚀 Tax Advisor - Phase 5/6 with Year-Based Savings Tracking")
-    print(f"OCR.space API Key: {'✅ Configured' if OCR_SPACE_API_KEY else '❌ Not configured'}")
+    print(f"OCR engines: {ocr_router.engine_list} {'✅' if ocr_router.available() else '❌ none available'}")
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
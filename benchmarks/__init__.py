@@ -0,0 +1 @@
+"""Benchmarks and load tools; run from the repository root with python -m benchmarks.<name>."""
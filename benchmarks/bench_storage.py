@@ -0,0 +1,185 @@
+"""Time the dashboard and save paths on synthetic data, for each storage backend.
+
+    python -m benchmarks.bench_storage --users 50 --months 36 --out before.json
+    python -m benchmarks.compare before.json after.json
+
+Every backend gets a fresh database in a temporary directory: the JSON
+file, SQLite (the local stand-in for Postgres), and Postgres itself when
+BENCH_DATABASE_URL points at a scratch database. Requests go through the
+Flask test client, so routing, sessions and JSON encoding are included.
+The app's own database (DATABASE_URL, e.g. from .env) is never touched.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+# Importing database/app builds the app's default Database from the
+# environment, and app.py loads .env (which doesn't override variables that
+# are already set). Point it at an empty scratch directory instead of the
+# production DATABASE_URL or the repo's database.json; it is never used
+_scratch_dir = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = ''
+os.environ['DB_BACKEND'] = 'sharded'
+os.environ['SHARD_DIR'] = _scratch_dir.name
+
+import app as app_module
+from database import Database
+from http_cache import response_cache
+from fiscal_calendar import financial_year
+from benchmarks.synthetic import generate_users, load_users, payslip, tax_answers
+
+BACKENDS = ('json', 'sqlite', 'postgres')
+
+
+def make_database(backend, workdir):
+    """A fresh Database for one run, or None if the backend is not available"""
+    if backend == 'postgres':
+        url = os.getenv('BENCH_DATABASE_URL')
+        if not url:
+            return None
+        db = Database(db_url=url)
+        # Only ever touches the benchmark's own users
+        with db._connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM users WHERE email LIKE %s", ('bench%@example.com',))
+            cur.close()
+        return db
+    if backend == 'sqlite':
+        return Database(db_url='', backend='sqlite', sqlite_file=os.path.join(workdir, 'bench.db'))
+    return Database(db_file=os.path.join(workdir, 'bench.json'), db_url='', backend='json')
+
+
+def summarize(samples):
+    """Latency statistics in milliseconds"""
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(percentile(50), 3),
+        "p95_ms": round(percentile(95), 3),
+        "p99_ms": round(percentile(99), 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+def run_backend(backend, users, requests_per_op, seed):
+    with tempfile.TemporaryDirectory() as workdir:
+        db = make_database(backend, workdir)
+        if db is None:
+            return None
+
+        start = time.perf_counter()
+        load_users(db, users)
+        load_seconds = time.perf_counter() - start
+
+        app_module.db = db
+        client = app_module.app.test_client()
+        rnd = random.Random(seed)
+        timings = {}
+
+        def timed(op, email, call, clear_cache=True, expect=200):
+            with client.session_transaction() as session:
+                session['user_email'] = email
+            if clear_cache:
+                response_cache.clear()
+            start = time.perf_counter()
+            response = call()
+            timings.setdefault(op, []).append(time.perf_counter() - start)
+            if response.status_code != expect:
+                raise RuntimeError(f"{backend} {op}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+            return response
+
+        for _ in range(requests_per_op):
+            email, _, records = rnd.choice(users)
+            year = rnd.choice([''] + sorted({financial_year(r["month"]) for r in records}))
+            url = '/api/financial-summary' + (f'?year={year}' if year else '')
+
+            response = timed('financial_summary', email, lambda: client.get(url))
+            timed('financial_summary_cached', email, lambda: client.get(url), clear_cache=False)
+            etag = response.headers['ETag']
+            timed('financial_summary_304', email,
+                  lambda: client.get(url, headers={'If-None-Match': etag}), clear_cache=False, expect=304)
+            timed('financial_years', email, lambda: client.get('/api/financial-years'))
+            timed('dashboard_bootstrap', email, lambda: client.get('/api/dashboard-bootstrap'))
+
+        for _ in range(requests_per_op):
+            email, _, records = rnd.choice(users)
+            key = rnd.choice(records)["month"]
+            timed('save_monthly_record', email,
+                  lambda: client.post('/api/save-monthly-data', json=payslip(rnd, key)))
+            timed('save_tax_analysis', email,
+                  lambda: client.post('/api/calculate-tax',
+                                      json={"month": key, "answers": tax_answers(rnd), "income": 100000}))
+
+        return {
+            "load_seconds": round(load_seconds, 3),
+            "ops": {op: summarize(samples) for op, samples in timings.items()}
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per operation')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--backend', action='append', choices=BACKENDS,
+                        help='repeat to pick several (default: all available)')
+    parser.add_argument('--out', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    users = generate_users(args.users, args.months, seed=args.seed)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "months": args.months,
+            "requests": args.requests,
+            "seed": args.seed
+        },
+        "backends": {}
+    }
+
+    for backend in args.backend or BACKENDS:
+        result = run_backend(backend, users, args.requests, args.seed)
+        if result is None:
+            print(f"⏭️ Skipping {backend} (set BENCH_DATABASE_URL to include it)", file=sys.stderr)
+            continue
+        report["backends"][backend] = result
+        print(f"✅ {backend}: loaded in {result['load_seconds']}s", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
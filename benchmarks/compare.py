@@ -0,0 +1,49 @@
+"""Compare two bench_storage reports.
+
+    python -m benchmarks.compare before.json after.json [--metric p95_ms] [--fail-above 1.2]
+
+Prints old -> new for every backend and operation in both reports. Exits
+with status 1 when any ratio is above --fail-above, so it can gate CI.
+"""
+import sys
+import json
+import argparse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--metric', default='p50_ms')
+    parser.add_argument('--fail-above', type=float, default=None,
+                        help='fail if new/old exceeds this ratio for any operation')
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')} ({args.metric})")
+    regressions = []
+    for backend, new_result in new["backends"].items():
+        old_result = old["backends"].get(backend)
+        if not old_result:
+            continue
+        for op, stats in sorted(new_result["ops"].items()):
+            if op not in old_result["ops"]:
+                continue
+            before = old_result["ops"][op][args.metric]
+            after = stats[args.metric]
+            ratio = after / before if before else float('inf')
+            print(f"{backend:10} {op:28} {before:10.3f} -> {after:10.3f}  x{ratio:.2f}")
+            if args.fail_above and ratio > args.fail_above:
+                regressions.append(f"{backend} {op}")
+
+    if regressions:
+        print(f"❌ Slower than x{args.fail_above}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""Replay realistic dashboard sessions with concurrent virtual users.
+
+    # In-process, against a fresh synthetic SQLite database
+    python -m benchmarks.load_replay --vus 16 --duration 30 --backend sqlite
+
+    # Over HTTP against a running server (gunicorn, python app.py, ...)
+    python -m benchmarks.load_replay --url http://localhost:5000 --vus 32 --duration 60 --signup
+
+    # Add a payslip upload to each session; in-process runs use the fixture
+    # OCR engine (start a server with OCR_ENGINES=fixture to do the same)
+    python -m benchmarks.load_replay --vus 8 --duration 30 --upload
+
+One session is what a user does in a visit: log in, open the dashboard
+(page + bootstrap), switch between a couple of financial years, save a
+payslip (which refreshes the dashboard), then open the tax analyzer for a
+month and calculate. With --upload, the session first uploads a payslip
+photo for OCR. Each virtual user runs sessions back to back until the
+duration is up. The report gives throughput and latency percentiles per
+step, as a table on stderr and JSON on stdout (or --out).
+"""
+import os
+import sys
+import json
+import time
+import random
+import io
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from benchmarks.synthetic import BENCH_PASSWORD, generate_users, load_users, payslip, tax_answers
+
+
+class InProcessClient:
+    """Flask test client with its own cookie jar"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, **kwargs):
+        response = self.client.open(path, method=method, **kwargs)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """requests.Session against a running server; redirects are not followed"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, **kwargs):
+        response = self.session.request(method, self.base_url + path, allow_redirects=False,
+                                        timeout=30, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+
+class Recorder:
+    """Per-step latencies and error counts, shared by all virtual users"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def call(self, client, step, method, path, expect=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            status, body = client.request(method, path, **kwargs)
+        except Exception:
+            status, body = None, None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples.setdefault(step, []).append(elapsed)
+            if status not in expect:
+                self.errors[step] = self.errors.get(step, 0) + 1
+        return body if status in expect else None
+
+
+def payslip_image(rnd):
+    """A page-sized JPEG, different every time so the OCR cache misses"""
+    from PIL import Image, ImageDraw
+    image = Image.new('L', (1240, 1754), 255)
+    draw = ImageDraw.Draw(image)
+    for line in range(40):
+        draw.text((80, 80 + line * 40), f"Basic Pay {rnd.random() * 100000:,.2f}", fill=0)
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def run_session(client, recorder, email, rnd, upload=False):
+    """One dashboard + tax-analyzer visit"""
+    call = recorder.call
+    call(client, 'login', 'POST', '/login', expect=(302,),
+         data={"email": email, "password": BENCH_PASSWORD})
+    if upload:
+        call(client, 'analyze_payslip', 'POST', '/analyze-payslip',
+             data=payslip_image(rnd), headers={"Content-Type": "image/jpeg"})
+    call(client, 'dashboard_page', 'GET', '/dashboard')
+    bootstrap = call(client, 'dashboard_bootstrap', 'GET', '/api/dashboard-bootstrap') or {}
+
+    years = bootstrap.get("years") or []
+    for year in rnd.sample(years, min(2, len(years))):
+        call(client, 'financial_summary', 'GET', f'/api/financial-summary?year={year}')
+    call(client, 'financial_summary', 'GET', '/api/financial-summary')
+
+    months = bootstrap.get("months") or []
+    month = rnd.choice(months) if months else 'April 2024'
+    call(client, 'save_monthly_data', 'POST', '/api/save-monthly-data', json=payslip(rnd, month))
+    call(client, 'dashboard_bootstrap', 'GET', '/api/dashboard-bootstrap')
+
+    call(client, 'tax_analyzer_page', 'GET', '/tax-analyzer')
+    call(client, 'month_with_tax', 'GET', f'/api/month-with-tax/{month}')
+    call(client, 'calculate_tax', 'POST', '/api/calculate-tax',
+         json={"month": month, "answers": tax_answers(rnd), "income": 100000})
+    call(client, 'logout', 'GET', '/logout', expect=(302,))
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def report(recorder, elapsed, sessions, meta):
+    steps = {}
+    for step, samples in recorder.samples.items():
+        ordered = sorted(samples)
+        steps[step] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(step, 0),
+            "rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+            "p90_ms": round(percentile(ordered, 90) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2)
+        }
+    total = sum(step["requests"] for step in steps.values())
+    return {
+        "meta": meta,
+        "elapsed_seconds": round(elapsed, 2),
+        "sessions": sessions,
+        "sessions_per_second": round(sessions / elapsed, 2),
+        "requests_per_second": round(total / elapsed, 2),
+        "steps": steps
+    }
+
+
+def print_table(result):
+    print(f"{result['sessions']} sessions in {result['elapsed_seconds']}s "
+          f"({result['sessions_per_second']}/s, {result['requests_per_second']} req/s)", file=sys.stderr)
+    print(f"{'step':22} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}", file=sys.stderr)
+    for step, stats in sorted(result["steps"].items()):
+        print(f"{step:22} {stats['requests']:7} {stats['errors']:5} {stats['rps']:8} "
+              f"{stats['p50_ms']:8} {stats['p95_ms']:8} {stats['p99_ms']:8} {stats['max_ms']:8}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='base URL of a running server (default: in-process)')
+    parser.add_argument('--backend', choices=('json', 'sqlite'), default='sqlite',
+                        help='in-process storage backend')
+    parser.add_argument('--vus', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--users', type=int, default=50, help='distinct accounts to spread the VUs over')
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--signup', action='store_true',
+                        help='HTTP mode: create the benchmark accounts first (signup, then one save each)')
+    parser.add_argument('--upload', action='store_true',
+                        help='upload a payslip for OCR in each session (in-process: fixture OCR engine)')
+    parser.add_argument('--out', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    users = generate_users(args.users, args.months, seed=args.seed)
+    workdir = None
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+        if args.signup:
+            for email, name, records in users:
+                client = make_client()
+                client.request('POST', '/signup', data={"name": name, "email": email, "password": BENCH_PASSWORD})
+                client.request('POST', '/api/save-monthly-data/bulk', json={"months": records})
+    else:
+        if args.upload:
+            # Never send benchmark traffic to OCR.space
+            os.environ['OCR_ENGINES'] = 'fixture'
+        workdir = tempfile.TemporaryDirectory()
+        # Importing app builds its default Database from the environment and
+        # .env (which doesn't override what is already set): keep it off the
+        # configured DATABASE_URL and the repo's database.json
+        os.environ['DATABASE_URL'] = ''
+        os.environ['DB_BACKEND'] = 'sharded'
+        os.environ['SHARD_DIR'] = os.path.join(workdir.name, 'unused')
+        import app as app_module
+        from database import Database
+        if args.backend == 'sqlite':
+            db = Database(db_url='', backend='sqlite', sqlite_file=os.path.join(workdir.name, 'load.db'))
+        else:
+            db = Database(db_file=os.path.join(workdir.name, 'load.json'), db_url='', backend='json')
+        load_users(db, users)
+        app_module.db = db
+        make_client = lambda: InProcessClient(app_module.app)
+
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+    sessions = [0] * args.vus
+
+    def virtual_user(index):
+        rnd = random.Random(args.seed + index)
+        client = make_client()
+        email = users[index % len(users)][0]
+        while time.perf_counter() < deadline:
+            run_session(client, recorder, email, rnd, args.upload)
+            sessions[index] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.vus) as pool:
+        list(pool.map(virtual_user, range(args.vus)))
+    elapsed = time.perf_counter() - start
+
+    result = report(recorder, elapsed, sum(sessions), {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "target": args.url or f"in-process ({args.backend})",
+        "vus": args.vus,
+        "duration": args.duration,
+        "users": args.users,
+        "months": args.months,
+        "seed": args.seed,
+        "upload": args.upload
+    })
+    print_table(result)
+
+    output = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if workdir:
+        workdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Seeded synthetic users and payslip months.
+
+The same seed always produces the same users, months and amounts, so two
+benchmark runs (e.g. before and after a change) see identical data.
+"""
+import random
+from datetime import datetime
+from fiscal_calendar import month_key, financial_year
+
+BENCH_PASSWORD = 'bench-password'
+
+
+def payslip(rnd, key):
+    """One month as /api/save-monthly-data passes it to save_monthly_record"""
+    income = round(rnd.uniform(30000, 250000), 2)
+    deductions = round(income * rnd.uniform(0.05, 0.2), 2)
+    return {
+        "month": key,
+        "income": income,
+        "employer": rnd.choice(("Computer Solutions Pvt. Ltd", "Acme Analytics", "Northwind Labs")),
+        "date": key,
+        "deductions": deductions,
+        "net_pay": round(income - deductions, 2),
+        "hra": {},
+        "investments": {},
+        "insurance": {},
+        "tax_paid": deductions * 0.3
+    }
+
+
+def tax_answers(rnd):
+    """Tax analyzer inputs, as sent to /api/calculate-tax"""
+    return {
+        "ppf": rnd.choice((0, 5000, 12500, 50000)),
+        "elss": rnd.choice((0, 0, 10000, 25000)),
+        "insurance": rnd.choice((0, 15000, 25000)),
+        "rent_paid": rnd.choice((0, 0, 12000, 30000))
+    }
+
+
+def tax_analysis(rnd, key):
+    """A completed tax_analysis sub-document, as save_tax_analysis stores it"""
+    answers = tax_answers(rnd)
+    # Same 30% rule as calculate_tax_refund
+    results = {
+        "hra": round(answers["rent_paid"] * 0.3),
+        "section_80c": round((answers["ppf"] + answers["elss"]) * 0.3),
+        "section_80d": round(answers["insurance"] * 0.3)
+    }
+    results["total_refund"] = results["hra"] + results["section_80c"] + results["section_80d"]
+    return {
+        "status": "completed",
+        "last_calculated": datetime(2025, 1, 1).isoformat(),
+        "answers": answers,
+        "results": results,
+        "financial_year": financial_year(key)
+    }
+
+
+def generate_users(n_users, n_months, seed=42, tax_ratio=0.5):
+    """[(email, name, [month_data, ...]), ...] with n_months consecutive months per user"""
+    rnd = random.Random(seed)
+    users = []
+    for index in range(n_users):
+        # Each user starts in a different month between April 2018 and March 2022
+        start = 2018 * 12 + 3 + rnd.randrange(48)
+        records = []
+        for offset in range(n_months):
+            ordinal = start + offset
+            key = month_key(ordinal % 12 + 1, ordinal // 12)
+            record = payslip(rnd, key)
+            if rnd.random() < tax_ratio:
+                record["tax_analysis"] = tax_analysis(rnd, key)
+            records.append(record)
+        users.append((f"bench{index}@example.com", f"Bench User {index}", records))
+    return users
+
+
+def load_users(db, users):
+    """Create the users and save their months through the Database API"""
+    for email, name, records in users:
+        db.create_user(email, BENCH_PASSWORD, name)
+        db.save_monthly_records(email, records)
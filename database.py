@@ -1,104 +1,282 @@
 import os
+import copy
 import json
 import hashlib
 import secrets
+import sqlite3
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+from contextlib import contextmanager
 from datetime import datetime
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from fiscal_calendar import financial_year as calculate_financial_year, sort_months
+from summary import fy_contributions
+from logging_config import get_logger
+
+log = get_logger('database')
 
 class Database:
-    def __init__(self, db_file="database.json"):
+    def __init__(self, db_file="database.json", db_url=None, backend=None, sqlite_file=None):
         self.db_file = db_file
-        self.db_url = os.getenv('DATABASE_URL')
+        self.db_url = db_url if db_url is not None else os.getenv('DATABASE_URL')
+        
+        # Local storage when there is no DATABASE_URL: "json" (database.json),
+        # "sharded" (one JSON file per user under SHARD_DIR) or "sqlite"
+        # (a real SQLite file at SQLITE_PATH)
+        if self.db_url:
+            self.backend = "postgres"
+        else:
+            self.backend = (backend or os.getenv('DB_BACKEND', 'json')).lower()
+        self.sqlite_file = sqlite_file or os.getenv('SQLITE_PATH', 'database.db')
+        self._sqlite_local = threading.local()
+        
+        # Parsed copy of db_file, see _load()
+        self._cache = None
+        self._cache_signature = None
+        self._cache_lock = threading.RLock()
+        
+        # Optional write-ahead journal for the JSON file, see _commit()
+        self.journal = os.getenv('DB_JOURNAL', '').lower() in ('1', 'true', 'yes')
+        self.journal_file = f"{db_file}.journal"
+        self.journal_max_bytes = int(os.getenv('DB_JOURNAL_MAX_BYTES', 1024 * 1024))
+        self._journal_offset = 0
+        
+        # Sharded layout: one file per user under SHARD_DIR, see _read_user()
+        self.shard_dir = os.getenv('SHARD_DIR', 'database.d')
+        self._shard_cache = {}
+        self._held_locks = threading.local()
+        
+        # Pool size is per process: with gunicorn every worker gets its own
+        # pool, so total connections = workers x DB_POOL_MAX
+        self.pool_min = int(os.getenv('DB_POOL_MIN', 1))
+        self.pool_max = int(os.getenv('DB_POOL_MAX', 5))
+        self.pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', 10))
+        self._reset_pool_state()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_pool_state)
         
         if self.db_url:
             # Use PostgreSQL on Render
             self.init_postgres()
-            print("✅ Using PostgreSQL database (production)")
+            log.info("✅ Using PostgreSQL database (production)")
+        elif self.backend == "sqlite":
+            # Real SQLite file for small self-hosted deployments
+            self.init_sqlite()
+            log.info("🗄️ Using SQLite database (%s)", self.sqlite_file)
         else:
-            # Fallback to SQLite for local development
+            # Fallback to a JSON file for local development
             self._init_db()
-            print("📁 Using SQLite database (local)")
+            if self.backend == "sharded":
+                log.info("📁 Using sharded JSON files (%s)", self.shard_dir)
+            else:
+                log.info("📁 Using JSON file database (local)")
+    
+    # ========== POSTGRESQL CONNECTION POOL ==========
+    
+    def _reset_pool_state(self):
+        """Forget any pool inherited from a parent process (runs after fork)"""
+        # The parent's sockets must not be shared, so the inherited pool is
+        # dropped without closing it; the child lazily opens its own
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+        self._pool_slots = threading.BoundedSemaphore(self.pool_max)
+        self._local = threading.local()
+        self._stats = {"borrowed": 0, "reused": 0, "waits": 0, "timeouts": 0, "discarded": 0}
+    
+    def _get_pool(self):
+        """Return this process's pool, creating it on first use"""
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = ThreadedConnectionPool(self.pool_min, self.pool_max, self.db_url)
+                    self._pool_pid = os.getpid()
+        return self._pool
+    
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection for one logical operation.
+        
+        Nested calls on the same thread reuse the outer connection, so an
+        operation that calls get_user() internally stays on one connection
+        and one transaction. The outermost block commits or rolls back.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._stats["reused"] += 1
+            yield conn
+            return
+        
+        # Wait for a free slot instead of failing when the pool is exhausted
+        if not self._pool_slots.acquire(blocking=False):
+            self._stats["waits"] += 1
+            if not self._pool_slots.acquire(timeout=self.pool_timeout):
+                self._stats["timeouts"] += 1
+                raise PoolError("Timed out waiting for a database connection")
+        
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+        except Exception:
+            self._pool_slots.release()
+            raise
+        
+        self._stats["borrowed"] += 1
+        self._local.conn = conn
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            broken = conn.closed != 0
+            if broken:
+                self._stats["discarded"] += 1
+            pool.putconn(conn, close=broken)
+            self._pool_slots.release()
+    
+    def pool_stats(self):
+        """Connection pool statistics for this worker process"""
+        if not self.db_url:
+            return {"backend": self.backend}
+        
+        pool = self._pool if self._pool_pid == os.getpid() else None
+        in_use = len(pool._used) if pool else 0
+        idle = len(pool._pool) if pool else 0
+        return {
+            "backend": "postgres",
+            "pid": os.getpid(),
+            "min": self.pool_min,
+            "max": self.pool_max,
+            "in_use": in_use,
+            "idle": idle,
+            **self._stats
+        }
     
     # ========== POSTGRESQL METHODS ==========
     
     def init_postgres(self):
         """Initialize PostgreSQL tables"""
         try:
-            conn = psycopg2.connect(self.db_url)
-            cur = conn.cursor()
-            
-            # Create users table with JSON field for financial_data
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    email TEXT PRIMARY KEY,
-                    password TEXT,
-                    name TEXT,
-                    auth_type TEXT,
-                    created_at TIMESTAMP,
-                    financial_data JSONB DEFAULT '{}'::jsonb
-                )
-            ''')
+            with self._connection() as conn:
+                cur = conn.cursor()
+                
+                # Create users table with JSON field for financial_data
+                cur.execute('''
+                    CREATE TABLE IF NOT EXISTS users (
+                        email TEXT PRIMARY KEY,
+                        password TEXT,
+                        name TEXT,
+                        auth_type TEXT,
+                        created_at TIMESTAMP,
+                        financial_data JSONB DEFAULT '{}'::jsonb
+                    )
+                ''')
+                
+                # One row per user per month; replaces users.financial_data.
+                # Legacy blobs are moved over by migrate_financial_data()
+                cur.execute('''
+                    CREATE TABLE IF NOT EXISTS monthly_records (
+                        email TEXT NOT NULL REFERENCES users(email) ON DELETE CASCADE,
+                        month TEXT NOT NULL,
+                        financial_year TEXT,
+                        data JSONB NOT NULL DEFAULT '{}'::jsonb,
+                        updated_at TIMESTAMP,
+                        PRIMARY KEY (email, month)
+                    )
+                ''')
+                cur.execute('''
+                    CREATE INDEX IF NOT EXISTS monthly_records_email_fy_idx
+                    ON monthly_records (email, financial_year)
+                ''')
+                
+                # Dashboard summary inputs: {month: contribution} per user and FY,
+                # updated in the same transaction as every monthly_records write.
+                # aggregates_ready stays FALSE for users saved before this table
+                # existed until get_fy_aggregates() or rebuild-aggregates fills it
+                cur.execute('''
+                    CREATE TABLE IF NOT EXISTS fy_aggregates (
+                        email TEXT NOT NULL REFERENCES users(email) ON DELETE CASCADE,
+                        financial_year TEXT NOT NULL,
+                        months JSONB NOT NULL DEFAULT '{}'::jsonb,
+                        PRIMARY KEY (email, financial_year)
+                    )
+                ''')
+                cur.execute('''
+                    ALTER TABLE users ADD COLUMN IF NOT EXISTS aggregates_ready BOOLEAN DEFAULT FALSE
+                ''')
+                
+                # Bumped by every write; the read APIs derive their ETags from it
+                cur.execute('''
+                    ALTER TABLE users ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT 0
+                ''')
+                cur.close()
             
-            conn.commit()
-            cur.close()
-            conn.close()
-            print("✅ PostgreSQL tables created successfully")
+            log.info("✅ PostgreSQL tables created successfully")
             
         except Exception as e:
-            print(f"❌ PostgreSQL initialization error: {e}")
+            log.error("❌ PostgreSQL initialization error: %s", e)
     
     def create_user(self, email, password, name):
         """Save new user to PostgreSQL"""
         if self.db_url:
             try:
-                conn = psycopg2.connect(self.db_url)
-                cur = conn.cursor()
-                
-                # Check if user exists
-                cur.execute('SELECT email FROM users WHERE email = %s', (email,))
-                if cur.fetchone():
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    
+                    # Check if user exists
+                    cur.execute('SELECT email FROM users WHERE email = %s', (email,))
+                    if cur.fetchone():
+                        cur.close()
+                        return False, "User already exists"
+                    
+                    # Insert new user with empty financial_data
+                    cur.execute('''
+                        INSERT INTO users (email, password, name, auth_type, created_at, financial_data, aggregates_ready)
+                        VALUES (%s, %s, %s, %s, %s, %s, TRUE)
+                    ''', (
+                        email,
+                        self._hash_password(password),
+                        name,
+                        'google' if password == 'GOOGLE_AUTH_USER' else 'local',
+                        datetime.now(),
+                        json.dumps({})  # Empty JSON object for financial_data
+                    ))
                     cur.close()
-                    conn.close()
-                    return False, "User already exists"
-                
-                # Insert new user with empty financial_data
-                cur.execute('''
-                    INSERT INTO users (email, password, name, auth_type, created_at, financial_data)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                ''', (
-                    email,
-                    self._hash_password(password),
-                    name,
-                    'google' if password == 'GOOGLE_AUTH_USER' else 'local',
-                    datetime.now(),
-                    json.dumps({})  # Empty JSON object for financial_data
-                ))
-                
-                conn.commit()
-                cur.close()
-                conn.close()
+                    
                 return True, "User created successfully"
                 
+            except psycopg2.errors.UniqueViolation:
+                # Signed up twice at once; the DETAIL would carry the email
+                return False, "User already exists"
             except Exception as e:
-                print(f"❌ PostgreSQL create user error: {e}")
+                log.error("❌ PostgreSQL create user error: %s", e)
                 return False, str(e)
-        else:
-            # SQLite version
+        elif self.backend == "sqlite":
             return self.create_user_sqlite(email, password, name)
+        else:
+            # JSON file version
+            return self.create_user_json(email, password, name)
     
     def get_user(self, email):
         """Get user details"""
         if self.db_url:
             try:
-                conn = psycopg2.connect(self.db_url, cursor_factory=RealDictCursor)
-                cur = conn.cursor()
-                
-                cur.execute('SELECT * FROM users WHERE email = %s', (email,))
-                user = cur.fetchone()
-                cur.close()
-                conn.close()
-                
+                with self._connection() as conn:
+                    cur = conn.cursor(cursor_factory=RealDictCursor)
+                    cur.execute('SELECT * FROM users WHERE email = %s', (email,))
+                    user = cur.fetchone()
+                    cur.close()
+                    
                 if user:
                     # Convert to dict and parse JSON
                     user_dict = dict(user)
@@ -110,14 +288,16 @@ class Database:
                 return None
                 
             except Exception as e:
-                print(f"❌ PostgreSQL get user error: {e}")
+                log.error("❌ PostgreSQL get user error: %s", e)
                 return None
-        else:
+        elif self.backend == "sqlite":
             return self.get_user_sqlite(email)
+        else:
+            return self.get_user_json(email)
     
     def verify_user(self, email, password):
         """Check if login is correct"""
-        if self.db_url:
+        if self.db_url or self.backend == "sqlite":
             user = self.get_user(email)
             if not user:
                 return False, "User not found"
@@ -130,7 +310,7 @@ class Database:
             
             return False, "Wrong password"
         else:
-            return self.verify_user_sqlite(email, password)
+            return self.verify_user_json(email, password)
     
     # ========== FINANCIAL DATA METHODS (KEEPING YOUR STRUCTURE) ==========
     
@@ -138,92 +318,146 @@ class Database:
         """Save monthly financial record for user - KEEPS YOUR JSON STRUCTURE"""
         if self.db_url:
             try:
-                conn = psycopg2.connect(self.db_url)
-                cur = conn.cursor()
-                
-                # Get current user data
-                user = self.get_user(email)
-                if not user:
-                    return False, "User not found"
-                
-                # Get existing financial_data or create new
-                financial_data = user.get('financial_data', {})
-                if not isinstance(financial_data, dict):
-                    financial_data = {}
-                
-                # Get month key
-                month_key = month_data.get("month")
+                month_key, financial_year, month_entry = self._month_entry(month_data)
                 if not month_key:
                     return False, "Month not specified"
                 
-                # Calculate financial year
-                from app import calculate_financial_year
-                financial_year = calculate_financial_year(month_key)
-                
-                # Create month entry with EXACTLY your structure
-                month_entry = {
-                    "income": month_data.get("income", 0),
-                    "employer": month_data.get("employer", ""),
-                    "date": month_data.get("date", ""),
-                    "deductions": month_data.get("deductions", 0),
-                    "net_pay": month_data.get("net_pay", 0),
-                    "hra": month_data.get("hra", {}),
-                    "investments": {
-                        "ppf": month_data.get("investments", {}).get("ppf", 0),
-                        "elss": month_data.get("investments", {}).get("elss", 0),
-                        "life_insurance": month_data.get("investments", {}).get("life_insurance", 0),
-                        "nsc": month_data.get("investments", {}).get("nsc", 0)
-                    },
-                    "insurance": {
-                        "self": month_data.get("insurance", {}).get("self", 0),
-                        "parents": month_data.get("insurance", {}).get("parents", 0)
-                    },
-                    "tax_paid": month_data.get("tax_paid", 0),
-                    "timestamp": datetime.now().isoformat(),
-                    "financial_year": financial_year
-                }
-                
-                # Add tax_analysis if present
-                if 'tax_analysis' in month_data:
-                    month_entry['tax_analysis'] = month_data['tax_analysis']
-                
-                # Update financial_data with new month
-                financial_data[month_key] = month_entry
+                # Single-row upsert; the users FK rejects unknown emails
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    self._upsert_month(cur, email, month_key, financial_year, month_entry)
+                    self._record_write(cur, email, fy_contributions({month_key: month_entry}))
+                    cur.close()
                 
-                # Save back to database
-                cur.execute('''
-                    UPDATE users 
-                    SET financial_data = %s 
-                    WHERE email = %s
-                ''', (json.dumps(financial_data), email))
+                return True, "Monthly record saved"
                 
-                conn.commit()
-                cur.close()
-                conn.close()
+            except psycopg2.errors.ForeignKeyViolation:
+                return False, "User not found"
+            except Exception as e:
+                log.error("❌ PostgreSQL save error: %s", e)
+                return False, str(e)
+        elif self.backend == "sqlite":
+            return self.save_monthly_record_sqlite(email, month_data)
+        else:
+            return self.save_monthly_record_json(email, month_data)
+    
+    def save_monthly_records(self, email, records):
+        """Save several months at once: one transaction, or one file write.
+        
+        Either every month is saved or none is. If a month appears twice,
+        the later record wins.
+        """
+        entries = {}
+        for month_data in records:
+            month_key, financial_year, month_entry = self._month_entry(month_data)
+            if not month_key:
+                return False, "Month not specified"
+            entries[month_key] = (financial_year, month_entry)
+        
+        if not entries:
+            return True, "No months to save"
+        
+        if self.db_url:
+            try:
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    execute_values(cur, '''
+                        INSERT INTO monthly_records (email, month, financial_year, data, updated_at)
+                        VALUES %s
+                        ON CONFLICT (email, month) DO UPDATE
+                        SET financial_year = EXCLUDED.financial_year,
+                            data = EXCLUDED.data,
+                            updated_at = EXCLUDED.updated_at
+                    ''', [
+                        (email, month_key, financial_year, json.dumps(month_entry), datetime.now())
+                        for month_key, (financial_year, month_entry) in entries.items()
+                    ])
+                    self._record_write(cur, email, fy_contributions({
+                        month_key: month_entry for month_key, (_, month_entry) in entries.items()
+                    }))
+                    cur.close()
                 
-                return True, "Monthly record saved"
+                return True, f"{len(entries)} monthly records saved"
                 
+            except psycopg2.errors.ForeignKeyViolation:
+                return False, "User not found"
             except Exception as e:
-                print(f"❌ PostgreSQL save error: {e}")
+                log.error("❌ PostgreSQL bulk save error: %s", e)
                 return False, str(e)
+        elif self.backend == "sqlite":
+            return self.save_monthly_records_sqlite(email, entries)
         else:
-            return self.save_monthly_record_sqlite(email, month_data)
+            return self.save_monthly_records_json(email, entries)
+    
+    def _month_entry(self, month_data):
+        """Build (month_key, financial_year, entry) for a month - KEEPS YOUR JSON STRUCTURE"""
+        month_key = month_data.get("month")
+        if not month_key:
+            return None, None, None
+        
+        financial_year = calculate_financial_year(month_key)
+        
+        # Create month entry with EXACTLY your structure
+        month_entry = {
+            "income": month_data.get("income", 0),
+            "employer": month_data.get("employer", ""),
+            "date": month_data.get("date", ""),
+            "deductions": month_data.get("deductions", 0),
+            "net_pay": month_data.get("net_pay", 0),
+            "hra": month_data.get("hra", {}),
+            "investments": {
+                "ppf": month_data.get("investments", {}).get("ppf", 0),
+                "elss": month_data.get("investments", {}).get("elss", 0),
+                "life_insurance": month_data.get("investments", {}).get("life_insurance", 0),
+                "nsc": month_data.get("investments", {}).get("nsc", 0)
+            },
+            "insurance": {
+                "self": month_data.get("insurance", {}).get("self", 0),
+                "parents": month_data.get("insurance", {}).get("parents", 0)
+            },
+            "tax_paid": month_data.get("tax_paid", 0),
+            "timestamp": datetime.now().isoformat(),
+            "financial_year": financial_year
+        }
+        
+        # Add tax_analysis if present
+        if 'tax_analysis' in month_data:
+            month_entry['tax_analysis'] = month_data['tax_analysis']
+        
+        return month_key, financial_year, month_entry
     
     def get_user_monthly_data(self, email, month=None):
         """Get monthly data - returns all months or specific month"""
         if self.db_url:
-            user = self.get_user(email)
-            if not user:
+            try:
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    
+                    if month:
+                        cur.execute(self._MONTH_SQL, {"email": email, "month": month})
+                        row = cur.fetchone()
+                        cur.close()
+                        return row[0] if row else {}
+                    
+                    cur.execute(self._MONTHS_SQL, {"email": email})
+                    financial_data = {month_key: data for month_key, data in cur.fetchall()}
+                    
+                    # Keep the old shape for unknown users
+                    if not financial_data:
+                        cur.execute('SELECT 1 FROM users WHERE email = %s', (email,))
+                        if not cur.fetchone():
+                            financial_data = []
+                    cur.close()
+                
+                return financial_data
+                
+            except Exception as e:
+                log.error("❌ PostgreSQL monthly data error: %s", e)
                 return {} if month else []
-            
-            financial_data = user.get('financial_data', {})
-            
-            if month:
-                return financial_data.get(month, {})
-            
-            return financial_data
-        else:
+        elif self.backend == "sqlite":
             return self.get_user_monthly_data_sqlite(email, month)
+        else:
+            return self.get_user_monthly_data_json(email, month)
     
     def get_user_yearly_summary(self, email, financial_year=None):
         """Get yearly summary - KEEPS YOUR LOGIC"""
@@ -248,11 +482,11 @@ class Database:
             "monthly_breakdown": []
         }
         
-        # Your exact filtering logic
-        for month_key, data in monthly_data.items():
+        # Your exact filtering logic, in date order
+        for month_key in sort_months(monthly_data):
+            data = monthly_data[month_key]
             month_fy = data.get('financial_year')
             if not month_fy:
-                from app import calculate_financial_year
                 month_fy = calculate_financial_year(month_key)
             
             if financial_year and month_fy != financial_year:
@@ -281,12 +515,11 @@ class Database:
         monthly_data = self.get_user_monthly_data(email)
         years = set()
         
-        for month_key, data in monthly_data.items():
-            fy = data.get('financial_year')
+        for month_key in monthly_data:
+            fy = monthly_data[month_key].get('financial_year')
             if fy:
                 years.add(fy)
             else:
-                from app import calculate_financial_year
                 fy = calculate_financial_year(month_key)
                 if fy:
                     years.add(fy)
@@ -296,68 +529,58 @@ class Database:
     def get_all_months_list(self, email):
         """Get list of all months - KEEPS YOUR LOGIC"""
         monthly_data = self.get_user_monthly_data(email)
-        return sorted(monthly_data.keys())
+        return sort_months(monthly_data)
     
     def update_monthly_investments(self, email, month, investment_data):
         """Update investment data - KEEPS YOUR LOGIC"""
         if self.db_url:
             try:
-                conn = psycopg2.connect(self.db_url)
-                cur = conn.cursor()
-                
-                user = self.get_user(email)
-                if not user:
-                    return False, "User not found"
-                
-                financial_data = user.get('financial_data', {})
-                
-                if month not in financial_data:
-                    return False, "Month data not found"
-                
-                if "investments" not in financial_data[month]:
-                    financial_data[month]["investments"] = {}
-                
-                for key, value in investment_data.items():
-                    financial_data[month]["investments"][key] = value
-                
-                cur.execute('''
-                    UPDATE users 
-                    SET financial_data = %s 
-                    WHERE email = %s
-                ''', (json.dumps(financial_data), email))
-                
-                conn.commit()
-                cur.close()
-                conn.close()
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    
+                    # Patch only the investments subtree, server-side
+                    cur.execute(self._PATCH_INVESTMENTS_SQL, {
+                        "email": email,
+                        "month": month,
+                        "investments": json.dumps(investment_data),
+                        "now": datetime.now()
+                    })
+                    
+                    # Miss: the month may still be in a legacy blob
+                    if cur.rowcount == 0 and self._migrate_user(cur, email):
+                        cur.execute(self._PATCH_INVESTMENTS_SQL, {
+                            "email": email,
+                            "month": month,
+                            "investments": json.dumps(investment_data),
+                            "now": datetime.now()
+                        })
+                    
+                    if cur.rowcount == 0:
+                        cur.execute('SELECT 1 FROM users WHERE email = %s', (email,))
+                        if not cur.fetchone():
+                            return False, "User not found"
+                        return False, "Month data not found"
+                    
+                    self._record_write(cur, email, fy_contributions({month: cur.fetchone()[0]}))
+                    cur.close()
                 
                 return True, "Investments updated"
                 
             except Exception as e:
-                print(f"❌ PostgreSQL update error: {e}")
+                log.error("❌ PostgreSQL update error: %s", e)
                 return False, str(e)
-        else:
+        elif self.backend == "sqlite":
             return self.update_monthly_investments_sqlite(email, month, investment_data)
+        else:
+            return self.update_monthly_investments_json(email, month, investment_data)
     
     def save_tax_analysis(self, email, month, answers, results):
         """Save tax analysis - KEEPS YOUR STRUCTURE"""
         if self.db_url:
             try:
-                conn = psycopg2.connect(self.db_url)
-                cur = conn.cursor()
-                
-                user = self.get_user(email)
-                if not user:
-                    return False
-                
-                financial_data = user.get('financial_data', {})
-                
-                if month not in financial_data:
-                    financial_data[month] = {}
-                
-                from app import calculate_financial_year
                 financial_year = calculate_financial_year(month)
                 
-                financial_data[month]["tax_analysis"] = {
+                tax_analysis = {
                     "status": "completed",
                     "last_calculated": datetime.now().isoformat(),
                     "answers": answers,
@@ -365,44 +588,864 @@ class Database:
                     "financial_year": financial_year
                 }
                 
-                cur.execute('''
-                    UPDATE users 
-                    SET financial_data = %s 
-                    WHERE email = %s
-                ''', (json.dumps(financial_data), email))
-                
-                conn.commit()
-                cur.close()
-                conn.close()
+                # One round trip, no read: replaces only data->'tax_analysis'
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    cur.execute(self._PATCH_TAX_ANALYSIS_SQL, {
+                        "email": email,
+                        "month": month,
+                        "financial_year": financial_year,
+                        "tax_analysis": json.dumps(tax_analysis),
+                        "now": datetime.now()
+                    })
+                    self._record_write(cur, email, fy_contributions({month: cur.fetchone()[0]}))
+                    cur.close()
                 
                 return True
                 
+            except psycopg2.errors.ForeignKeyViolation:
+                return False
             except Exception as e:
-                print(f"❌ PostgreSQL tax analysis save error: {e}")
+                log.error("❌ PostgreSQL tax analysis save error: %s", e)
                 return False
-        else:
+        elif self.backend == "sqlite":
             return self.save_tax_analysis_sqlite(email, month, answers, results)
+        else:
+            return self.save_tax_analysis_json(email, month, answers, results)
+    
+    # ========== DATA VERSION ==========
+    
+    def get_data_version(self, email):
+        """Counter bumped by every write to the user's months; None for unknown users"""
+        if self.db_url:
+            try:
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    cur.execute('SELECT data_version FROM users WHERE email = %s', (email,))
+                    row = cur.fetchone()
+                    cur.close()
+                return row[0] if row else None
+                
+            except Exception as e:
+                log.error("❌ PostgreSQL data version error: %s", e)
+                return None
+        elif self.backend == "sqlite":
+            row = self._sqlite().execute(
+                'SELECT data_version FROM users WHERE email = ?', (email,)
+            ).fetchone()
+            return row[0] if row else None
+        else:
+            user = self._read_user(email)
+            return user.get("data_version", 0) if user is not None else None
     
-    # ========== SQLITE METHODS (YOUR EXISTING CODE) ==========
+    # ========== DASHBOARD AGGREGATES ==========
+    
+    def get_fy_aggregates(self, email):
+        """Summary inputs as {financial_year: {month: contribution}}.
+        
+        Every save updates these alongside the month itself. Users saved
+        before aggregates existed get them built on first read.
+        """
+        if self.db_url:
+            try:
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    cur.execute('''
+                        SELECT users.aggregates_ready, a.financial_year, a.months
+                        FROM users LEFT JOIN fy_aggregates a ON a.email = users.email
+                        WHERE users.email = %s
+                    ''', (email,))
+                    rows = cur.fetchall()
+                    
+                    if rows and not rows[0][0]:
+                        log.debug("📊 Building dashboard aggregates for %s", email)
+                        aggregates = self._rebuild_aggregates(cur, email)
+                    else:
+                        aggregates = {
+                            financial_year: months
+                            for _, financial_year, months in rows if financial_year is not None
+                        }
+                    cur.close()
+                
+                return aggregates
+                
+            except Exception as e:
+                log.error("❌ PostgreSQL aggregates error: %s", e)
+                return {}
+        elif self.backend == "sqlite":
+            return self.get_fy_aggregates_sqlite(email)
+        else:
+            return self.get_fy_aggregates_json(email)
+    
+    def rebuild_fy_aggregates(self, email=None):
+        """Recompute aggregates from the saved months, for one user or all; returns the user count.
+        
+        Each rebuilt user's data_version is bumped with the rebuild, so
+        summaries cached for the old version are not served again.
+        """
+        if self.db_url:
+            if email:
+                emails = [email]
+            else:
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    cur.execute('SELECT email FROM users')
+                    emails = [row[0] for row in cur.fetchall()]
+                    cur.close()
+            
+            # One short transaction per user
+            for user_email in emails:
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    self._rebuild_aggregates(cur, user_email)
+                    cur.execute('UPDATE users SET data_version = data_version + 1 WHERE email = %s',
+                                (user_email,))
+                    cur.close()
+            return len(emails)
+        elif self.backend == "sqlite":
+            return self.rebuild_fy_aggregates_sqlite(email)
+        else:
+            return self.rebuild_fy_aggregates_json(email)
+    
+    # ========== POSTGRESQL MONTHLY RECORDS ==========
+    
+    # Reads merge in months still sitting in a legacy users.financial_data
+    # blob, so the app keeps working while migrate_financial_data() runs
+    _MONTHS_SQL = '''
+        SELECT month, data FROM monthly_records WHERE email = %(email)s
+        UNION ALL
+        SELECT legacy.key, legacy.value
+        FROM users, jsonb_each(users.financial_data) AS legacy
+        WHERE users.email = %(email)s
+          AND NOT EXISTS (
+              SELECT 1 FROM monthly_records m
+              WHERE m.email = users.email AND m.month = legacy.key
+          )
+        ORDER BY 1
+    '''
+    
+    _MONTH_SQL = '''
+        SELECT data FROM monthly_records WHERE email = %(email)s AND month = %(month)s
+        UNION ALL
+        SELECT financial_data -> %(month)s FROM users
+        WHERE email = %(email)s AND financial_data ? %(month)s
+        LIMIT 1
+    '''
+    
+    # Both patches update the row in place with jsonb_set, so concurrent
+    # requests for the same user cannot overwrite each other's changes
+    _PATCH_INVESTMENTS_SQL = '''
+        UPDATE monthly_records
+        SET data = jsonb_set(
+                data, '{investments}',
+                CASE WHEN jsonb_typeof(data -> 'investments') = 'object'
+                     THEN data -> 'investments' ELSE '{}'::jsonb END
+                || %(investments)s::jsonb
+            ),
+            updated_at = %(now)s
+        WHERE email = %(email)s AND month = %(month)s
+        RETURNING data
+    '''
+    
+    # A new row starts from the month's legacy blob entry, if there is one
+    _PATCH_TAX_ANALYSIS_SQL = '''
+        INSERT INTO monthly_records (email, month, financial_year, data, updated_at)
+        VALUES (
+            %(email)s, %(month)s, %(financial_year)s,
+            COALESCE(
+                (SELECT financial_data -> %(month)s FROM users WHERE email = %(email)s),
+                '{}'::jsonb
+            ) || jsonb_build_object('tax_analysis', %(tax_analysis)s::jsonb),
+            %(now)s
+        )
+        ON CONFLICT (email, month) DO UPDATE
+        SET data = jsonb_set(monthly_records.data, '{tax_analysis}', EXCLUDED.data -> 'tax_analysis'),
+            financial_year = COALESCE(monthly_records.financial_year, EXCLUDED.financial_year),
+            updated_at = EXCLUDED.updated_at
+        RETURNING data
+    '''
+    
+    def _upsert_month(self, cur, email, month, financial_year, month_entry):
+        """Insert or replace one (email, month) row"""
+        cur.execute('''
+            INSERT INTO monthly_records (email, month, financial_year, data, updated_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (email, month) DO UPDATE
+            SET financial_year = COALESCE(EXCLUDED.financial_year, monthly_records.financial_year),
+                data = EXCLUDED.data,
+                updated_at = EXCLUDED.updated_at
+        ''', (email, month, financial_year, json.dumps(month_entry), datetime.now()))
+    
+    def _record_write(self, cur, email, aggregates):
+        """Bump the user's data_version and merge {financial_year: {month: contribution}} into fy_aggregates.
+        
+        The users row stays locked until commit, so a concurrent rebuild
+        (which takes it FOR UPDATE) sees this write either fully or not at all.
+        """
+        cur.execute('''
+            UPDATE users SET data_version = data_version + 1
+            WHERE email = %s
+            RETURNING aggregates_ready
+        ''', (email,))
+        row = cur.fetchone()
+        # Not built yet: get_fy_aggregates() rebuilds from monthly_records
+        if not aggregates or not row or not row[0]:
+            return
+        execute_values(cur, '''
+            INSERT INTO fy_aggregates (email, financial_year, months) VALUES %s
+            ON CONFLICT (email, financial_year) DO UPDATE
+            SET months = fy_aggregates.months || EXCLUDED.months
+        ''', [
+            (email, financial_year, json.dumps(months))
+            for financial_year, months in aggregates.items()
+        ])
+    
+    def _rebuild_aggregates(self, cur, email):
+        """Recompute one user's fy_aggregates from monthly_records; returns them"""
+        cur.execute('SELECT 1 FROM users WHERE email = %s FOR UPDATE', (email,))
+        if not cur.fetchone():
+            return {}
+        
+        self._migrate_user(cur, email)
+        cur.execute('SELECT month, data FROM monthly_records WHERE email = %s', (email,))
+        aggregates = fy_contributions(dict(cur.fetchall()))
+        
+        cur.execute('DELETE FROM fy_aggregates WHERE email = %s', (email,))
+        if aggregates:
+            execute_values(cur, '''
+                INSERT INTO fy_aggregates (email, financial_year, months) VALUES %s
+            ''', [
+                (email, financial_year, json.dumps(months))
+                for financial_year, months in aggregates.items()
+            ])
+        cur.execute('UPDATE users SET aggregates_ready = TRUE WHERE email = %s', (email,))
+        return aggregates
+    
+    def _migrate_user(self, cur, email):
+        """Move one user's legacy financial_data blob into monthly_records"""
+        cur.execute('''
+            SELECT financial_data FROM users
+            WHERE email = %s AND financial_data <> '{}'::jsonb
+            FOR UPDATE
+        ''', (email,))
+        row = cur.fetchone()
+        if not row:
+            return 0
+        
+        financial_data = row[0]
+        if isinstance(financial_data, str):
+            financial_data = json.loads(financial_data)
+        
+        rows = [
+            (email, month_key, data.get('financial_year') or calculate_financial_year(month_key),
+             json.dumps(data), datetime.now())
+            for month_key, data in financial_data.items()
+        ]
+        # Rows written since the migration started win key-by-key
+        execute_values(cur, '''
+            INSERT INTO monthly_records (email, month, financial_year, data, updated_at)
+            VALUES %s
+            ON CONFLICT (email, month) DO UPDATE
+            SET financial_year = COALESCE(monthly_records.financial_year, EXCLUDED.financial_year),
+                data = EXCLUDED.data || monthly_records.data
+        ''', rows)
+        cur.execute("UPDATE users SET financial_data = '{}'::jsonb WHERE email = %s", (email,))
+        return len(rows)
+    
+    def migrate_financial_data(self, batch_size=100):
+        """Move every legacy financial_data blob into monthly_records.
+        
+        Safe to run while the app is serving: each batch is its own short
+        transaction, and rows locked by a live request are skipped and picked
+        up by a later batch. Returns the number of users migrated.
+        """
+        if not self.db_url:
+            return 0
+        
+        migrated = 0
+        while True:
+            with self._connection() as conn:
+                cur = conn.cursor()
+                cur.execute('''
+                    SELECT email FROM users
+                    WHERE financial_data <> '{}'::jsonb
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ''', (batch_size,))
+                emails = [row[0] for row in cur.fetchall()]
+                for email in emails:
+                    self._migrate_user(cur, email)
+                cur.close()
+            
+            if not emails:
+                break
+            migrated += len(emails)
+            log.info("📦 Migrated %d users to monthly_records", migrated)
+        
+        return migrated
+    
+    # ========== SQLITE METHODS ==========
+    
+    def _sqlite(self):
+        """Return this thread's SQLite connection, opening it on first use"""
+        conn = getattr(self._sqlite_local, 'conn', None)
+        if conn is None or self._sqlite_local.pid != os.getpid():
+            # isolation_level=None: transactions are opened explicitly below.
+            # The SQL strings are constants, so sqlite3's per-connection
+            # statement cache reuses the prepared statements
+            conn = sqlite3.connect(self.sqlite_file, timeout=10, isolation_level=None,
+                                   check_same_thread=False, cached_statements=64)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute('PRAGMA foreign_keys = ON')
+            self._sqlite_local.conn = conn
+            self._sqlite_local.pid = os.getpid()
+        return conn
+    
+    @contextmanager
+    def _sqlite_write(self):
+        """Run a write transaction; BEGIN IMMEDIATE takes the write lock up front"""
+        conn = self._sqlite()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def init_sqlite(self):
+        """Initialize SQLite tables"""
+        try:
+            with self._sqlite_write() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS users (
+                        email TEXT PRIMARY KEY,
+                        password TEXT,
+                        name TEXT,
+                        auth_type TEXT,
+                        created_at TEXT
+                    )
+                ''')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS monthly_records (
+                        email TEXT NOT NULL REFERENCES users(email) ON DELETE CASCADE,
+                        month TEXT NOT NULL,
+                        financial_year TEXT,
+                        data TEXT NOT NULL DEFAULT '{}',
+                        updated_at TEXT,
+                        PRIMARY KEY (email, month)
+                    ) WITHOUT ROWID
+                ''')
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS monthly_records_email_fy_idx
+                    ON monthly_records (email, financial_year)
+                ''')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS fy_aggregates (
+                        email TEXT NOT NULL REFERENCES users(email) ON DELETE CASCADE,
+                        financial_year TEXT NOT NULL,
+                        months TEXT NOT NULL DEFAULT '{}',
+                        PRIMARY KEY (email, financial_year)
+                    ) WITHOUT ROWID
+                ''')
+                # SQLite has no ADD COLUMN IF NOT EXISTS
+                columns = [row[1] for row in conn.execute('PRAGMA table_info(users)')]
+                if 'aggregates_ready' not in columns:
+                    conn.execute('ALTER TABLE users ADD COLUMN aggregates_ready INTEGER DEFAULT 0')
+                if 'data_version' not in columns:
+                    conn.execute('ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0')
+            log.info("✅ SQLite tables created successfully")
+            
+        except Exception as e:
+            log.error("❌ SQLite initialization error: %s", e)
+    
+    def import_json_file(self, json_file):
+        """Copy users and months from a database.json file into SQLite or shards"""
+        with open(json_file, 'r') as f:
+            data = json.load(f)
+        
+        if self.backend == "sharded":
+            for email, user in data.get("users", {}).items():
+                with self._user_lock(email):
+                    # Never reuse a version an earlier copy of this user had
+                    existing = self._read_user(email) or {}
+                    user["data_version"] = max(user.get("data_version", 0), existing.get("data_version", 0)) + 1
+                    self._write_user(email, user, [([], user)])
+            self._add_to_index(*data.get("users", {}))
+            return len(data.get("users", {}))
+        
+        users = 0
+        with self._sqlite_write() as conn:
+            for email, user in data.get("users", {}).items():
+                conn.execute('''
+                    INSERT OR IGNORE INTO users (email, password, name, auth_type, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (email, user.get("password"), user.get("name"),
+                      user.get("auth_type", "local"), user.get("created_at")))
+                conn.executemany('''
+                    INSERT OR IGNORE INTO monthly_records (email, month, financial_year, data, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [
+                    (email, month_key, month.get("financial_year") or calculate_financial_year(month_key),
+                     json.dumps(month), datetime.now().isoformat())
+                    for month_key, month in user.get("financial_data", {}).items()
+                ])
+                # Rebuilt from the imported months on the next dashboard read
+                conn.execute('''
+                    UPDATE users SET aggregates_ready = 0, data_version = data_version + 1
+                    WHERE email = ?
+                ''', (email,))
+                users += 1
+        return users
+    
+    def create_user_sqlite(self, email, password, name):
+        """Save new user to SQLite"""
+        try:
+            with self._sqlite_write() as conn:
+                conn.execute('''
+                    INSERT INTO users (email, password, name, auth_type, created_at, aggregates_ready)
+                    VALUES (?, ?, ?, ?, ?, 1)
+                ''', (
+                    email,
+                    self._hash_password(password),
+                    name,
+                    'google' if password == 'GOOGLE_AUTH_USER' else 'local',
+                    datetime.now().isoformat()
+                ))
+            return True, "User created successfully"
+        
+        except sqlite3.IntegrityError:
+            return False, "User already exists"
+        except Exception as e:
+            log.error("❌ SQLite create user error: %s", e)
+            return False, str(e)
+    
+    def get_user_sqlite(self, email):
+        """Get user details from SQLite"""
+        row = self._sqlite().execute('''
+            SELECT email, password, name, auth_type, created_at
+            FROM users WHERE email = ?
+        ''', (email,)).fetchone()
+        if not row:
+            return None
+        return dict(zip(("email", "password", "name", "auth_type", "created_at"), row))
+    
+    def save_monthly_record_sqlite(self, email, month_data):
+        """Save monthly record to SQLite"""
+        month_key, financial_year, month_entry = self._month_entry(month_data)
+        if not month_key:
+            return False, "Month not specified"
+        
+        try:
+            with self._sqlite_write() as conn:
+                conn.execute('''
+                    INSERT INTO monthly_records (email, month, financial_year, data, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (email, month) DO UPDATE
+                    SET financial_year = excluded.financial_year,
+                        data = excluded.data,
+                        updated_at = excluded.updated_at
+                ''', (email, month_key, financial_year, json.dumps(month_entry), datetime.now().isoformat()))
+                self._record_write_sqlite(conn, email, fy_contributions({month_key: month_entry}))
+            return True, "Monthly record saved"
+        
+        except sqlite3.IntegrityError:
+            return False, "User not found"
+        except Exception as e:
+            log.error("❌ SQLite save error: %s", e)
+            return False, str(e)
+    
+    def save_monthly_records_sqlite(self, email, entries):
+        """Save several months to SQLite in one transaction"""
+        try:
+            with self._sqlite_write() as conn:
+                conn.executemany('''
+                    INSERT INTO monthly_records (email, month, financial_year, data, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (email, month) DO UPDATE
+                    SET financial_year = excluded.financial_year,
+                        data = excluded.data,
+                        updated_at = excluded.updated_at
+                ''', [
+                    (email, month_key, financial_year, json.dumps(month_entry), datetime.now().isoformat())
+                    for month_key, (financial_year, month_entry) in entries.items()
+                ])
+                self._record_write_sqlite(conn, email, fy_contributions({
+                    month_key: month_entry for month_key, (_, month_entry) in entries.items()
+                }))
+            return True, f"{len(entries)} monthly records saved"
+        
+        except sqlite3.IntegrityError:
+            return False, "User not found"
+        except Exception as e:
+            log.error("❌ SQLite bulk save error: %s", e)
+            return False, str(e)
+    
+    def get_user_monthly_data_sqlite(self, email, month=None):
+        """Get monthly data from SQLite"""
+        conn = self._sqlite()
+        
+        if month:
+            row = conn.execute(
+                'SELECT data FROM monthly_records WHERE email = ? AND month = ?', (email, month)
+            ).fetchone()
+            return json.loads(row[0]) if row else {}
+        
+        financial_data = {
+            month_key: json.loads(data)
+            for month_key, data in conn.execute(
+                'SELECT month, data FROM monthly_records WHERE email = ? ORDER BY month', (email,)
+            )
+        }
+        
+        # Keep the old shape for unknown users
+        if not financial_data and not self.get_user_sqlite(email):
+            return []
+        return financial_data
+    
+    def update_monthly_investments_sqlite(self, email, month, investment_data):
+        """Update investments in SQLite"""
+        try:
+            # Read-modify-write is safe: BEGIN IMMEDIATE serialises writers
+            with self._sqlite_write() as conn:
+                row = conn.execute(
+                    'SELECT data FROM monthly_records WHERE email = ? AND month = ?', (email, month)
+                ).fetchone()
+                updated = row is not None
+                if updated:
+                    # A shallow merge that keeps null values, as Postgres' || and
+                    # the JSON backend do (json_patch would delete those keys)
+                    data = json.loads(row[0])
+                    investments = data.get("investments")
+                    data["investments"] = {**(investments if isinstance(investments, dict) else {}),
+                                           **investment_data}
+                    conn.execute('''
+                        UPDATE monthly_records SET data = ?, updated_at = ?
+                        WHERE email = ? AND month = ?
+                    ''', (json.dumps(data), datetime.now().isoformat(), email, month))
+                    self._record_write_sqlite(conn, email, fy_contributions({month: data}))
+            
+            if not updated:
+                if not self.get_user_sqlite(email):
+                    return False, "User not found"
+                return False, "Month data not found"
+            return True, "Investments updated"
+        
+        except Exception as e:
+            log.error("❌ SQLite update error: %s", e)
+            return False, str(e)
+    
+    def save_tax_analysis_sqlite(self, email, month, answers, results):
+        """Save tax analysis to SQLite"""
+        financial_year = calculate_financial_year(month)
+        
+        tax_analysis = {
+            "status": "completed",
+            "last_calculated": datetime.now().isoformat(),
+            "answers": answers,
+            "results": results,
+            "financial_year": financial_year
+        }
+        
+        try:
+            with self._sqlite_write() as conn:
+                conn.execute('''
+                    INSERT INTO monthly_records (email, month, financial_year, data, updated_at)
+                    VALUES (:email, :month, :financial_year,
+                            json_object('tax_analysis', json(:tax_analysis)), :now)
+                    ON CONFLICT (email, month) DO UPDATE
+                    SET data = json_set(monthly_records.data, '$.tax_analysis', json(:tax_analysis)),
+                        financial_year = COALESCE(monthly_records.financial_year, excluded.financial_year),
+                        updated_at = excluded.updated_at
+                ''', {
+                    "email": email,
+                    "month": month,
+                    "financial_year": financial_year,
+                    "tax_analysis": json.dumps(tax_analysis),
+                    "now": datetime.now().isoformat()
+                })
+                self._record_write_sqlite(conn, email, self._month_aggregates_sqlite(conn, email, month))
+            return True
+        
+        except sqlite3.IntegrityError:
+            return False
+        except Exception as e:
+            log.error("❌ SQLite tax analysis save error: %s", e)
+            return False
+    
+    def _month_aggregates_sqlite(self, conn, email, month):
+        """Contribution of one stored month, read back inside the write transaction"""
+        row = conn.execute(
+            'SELECT data FROM monthly_records WHERE email = ? AND month = ?', (email, month)
+        ).fetchone()
+        return fy_contributions({month: json.loads(row[0])}) if row else {}
+    
+    def _record_write_sqlite(self, conn, email, aggregates):
+        """Bump the user's data_version and merge {financial_year: {month: contribution}} into fy_aggregates"""
+        # Writers are serialised by BEGIN IMMEDIATE, so this cannot race a rebuild
+        conn.execute('UPDATE users SET data_version = data_version + 1 WHERE email = ?', (email,))
+        row = conn.execute('SELECT aggregates_ready FROM users WHERE email = ?', (email,)).fetchone()
+        if not aggregates or not row or not row[0]:
+            return
+        for financial_year, months in aggregates.items():
+            # Whole months replaced, as Postgres' || does; json_patch would
+            # merge them key by key and drop null values
+            existing = conn.execute(
+                'SELECT months FROM fy_aggregates WHERE email = ? AND financial_year = ?',
+                (email, financial_year)
+            ).fetchone()
+            if existing:
+                months = {**json.loads(existing[0]), **months}
+            conn.execute('''
+                INSERT INTO fy_aggregates (email, financial_year, months) VALUES (?, ?, ?)
+                ON CONFLICT (email, financial_year) DO UPDATE SET months = excluded.months
+            ''', (email, financial_year, json.dumps(months)))
+    
+    def _rebuild_aggregates_sqlite(self, conn, email):
+        """Recompute one user's fy_aggregates from monthly_records; returns them"""
+        aggregates = fy_contributions({
+            month_key: json.loads(data)
+            for month_key, data in conn.execute(
+                'SELECT month, data FROM monthly_records WHERE email = ?', (email,)
+            )
+        })
+        conn.execute('DELETE FROM fy_aggregates WHERE email = ?', (email,))
+        conn.executemany('INSERT INTO fy_aggregates (email, financial_year, months) VALUES (?, ?, ?)', [
+            (email, financial_year, json.dumps(months))
+            for financial_year, months in aggregates.items()
+        ])
+        conn.execute('UPDATE users SET aggregates_ready = 1 WHERE email = ?', (email,))
+        return aggregates
+    
+    def get_fy_aggregates_sqlite(self, email):
+        """Get dashboard aggregates from SQLite"""
+        rows = self._sqlite().execute('''
+            SELECT users.aggregates_ready, a.financial_year, a.months
+            FROM users LEFT JOIN fy_aggregates a ON a.email = users.email
+            WHERE users.email = ?
+        ''', (email,)).fetchall()
+        
+        if rows and not rows[0][0]:
+            log.debug("📊 Building dashboard aggregates for %s", email)
+            with self._sqlite_write() as conn:
+                return self._rebuild_aggregates_sqlite(conn, email)
+        
+        return {
+            financial_year: json.loads(months)
+            for _, financial_year, months in rows if financial_year is not None
+        }
+    
+    def rebuild_fy_aggregates_sqlite(self, email=None):
+        """Recompute SQLite aggregates for one user or all"""
+        conn = self._sqlite()
+        if email:
+            emails = [row[0] for row in conn.execute('SELECT email FROM users WHERE email = ?', (email,))]
+        else:
+            emails = [row[0] for row in conn.execute('SELECT email FROM users')]
+        
+        for user_email in emails:
+            with self._sqlite_write() as conn:
+                self._rebuild_aggregates_sqlite(conn, user_email)
+                conn.execute('UPDATE users SET data_version = data_version + 1 WHERE email = ?',
+                             (user_email,))
+        return len(emails)
+    
+    # ========== JSON FILE METHODS (YOUR EXISTING CODE) ==========
     
     def _init_db(self):
         """Create database file if it doesn't exist"""
+        if self.backend == "sharded":
+            os.makedirs(os.path.join(self.shard_dir, "users"), exist_ok=True)
+            return
+        
         if not os.path.exists(self.db_file):
             initial_data = {"users": {}}
             self._save(initial_data)
     
+    def _file_signature(self):
+        """Identify the current file version by inode, mtime and size"""
+        try:
+            st = os.stat(self.db_file)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    
+    @contextmanager
+    def _flock(self, lock_path):
+        """Exclusive cross-process (and cross-thread) lock on lock_path.
+        
+        Re-entrant within a thread, so a write path can hold it across its
+        whole read-modify-write while _commit() takes it again inside.
+        """
+        held = self._held_locks.__dict__.setdefault('paths', set())
+        if fcntl is None or lock_path in held:
+            yield
+            return
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            held.add(lock_path)
+            try:
+                yield
+            finally:
+                held.discard(lock_path)
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _file_lock(self):
+        """Lock for database.json journal appends, snapshots and user updates"""
+        return self._flock(f"{self.db_file}.lock")
+    
     def _load(self):
-        """Load data from file"""
+        """Load data from file.
+        
+        The parsed document is cached per process and only re-read when the
+        file's signature changes, i.e. when another worker has written it.
+        In journal mode, records appended since the last call are replayed
+        on top. Callers get the shared cached dict, which is never changed
+        in place (other threads may be reading it): writers _commit() their
+        changes, which swaps in a new dict.
+        """
+        signature = self._file_signature()
+        with self._cache_lock:
+            if signature is None or signature != self._cache_signature:
+                try:
+                    with open(self.db_file, 'r') as f:
+                        data = json.load(f)
+                except:
+                    return {"users": {}}
+                self._cache = data
+                self._cache_signature = signature
+                self._journal_offset = 0
+            
+            if self.journal and not self._replay_journal():
+                # Journal was compacted under us; start again from the new snapshot
+                self._cache_signature = None
+                return self._load()
+            return self._cache
+    
+    def _replay_journal(self):
+        """Apply journal records written since the last replay to the cache.
+        
+        Returns False if the journal shrank, i.e. another worker compacted it.
+        """
         try:
-            with open(self.db_file, 'r') as f:
-                return json.load(f)
-        except:
-            return {"users": {}}
+            size = os.path.getsize(self.journal_file)
+        except OSError:
+            size = 0
+        if size < self._journal_offset:
+            return False
+        if size == self._journal_offset:
+            return True
+        
+        with open(self.journal_file, 'rb') as f:
+            f.seek(self._journal_offset)
+            chunk = f.read(size - self._journal_offset)
+        
+        # Only consume complete lines; a partial tail is still being written
+        end = chunk.rfind(b'\n') + 1
+        data = self._cache
+        for line in chunk[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn record from a crashed writer; it was never acknowledged
+                log.warning("⚠️ Skipping unreadable journal record")
+                continue
+            for path, value in record["set"]:
+                data = self._with_change(data, path, value)
+        self._cache = data
+        self._journal_offset += end
+        return True
+    
+    def _with_change(self, data, path, value):
+        """Copy of data with data[path[0]][path[1]]... = value.
+        
+        Only the dicts along the path are copied (or created); data itself
+        is left as it was for anyone still reading it.
+        """
+        if not path:
+            return value
+        node = dict(data)
+        node[path[0]] = self._with_change(data.get(path[0], {}), path[1:], value)
+        return node
+    
+    def _commit(self, changes):
+        """Persist changes, a list of (path, value) pairs, and apply them to the cache.
+        
+        Without journaling this rewrites the whole file; with it, the
+        changes are appended as one fsynced journal record and the file is
+        only rewritten on compaction.
+        """
+        with self._file_lock(), self._cache_lock:
+            # Catch up on other workers' records so ours are applied last
+            data = self._load()
+            for path, value in changes:
+                data = self._with_change(data, path, value)
+            
+            if not self.journal:
+                self._write_snapshot(data)
+                return
+            
+            record = json.dumps({"set": changes}, separators=(',', ':')) + '\n'
+            try:
+                with open(self.journal_file, 'a+b') as f:
+                    # Start on a fresh line if a crashed writer left a torn record
+                    if f.tell() > 0:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b'\n':
+                            record = '\n' + record
+                    f.write(record.encode())
+                    f.flush()
+                    os.fsync(f.fileno())
+                    offset = f.tell()
+            except Exception:
+                # Some of the record may be in the file; re-read it all next time
+                self._cache = None
+                self._cache_signature = None
+                raise
+            
+            # Only now is the change durable, so only now may readers see it
+            self._cache = data
+            self._journal_offset = offset
+            
+            if self._journal_offset >= self.journal_max_bytes:
+                self._write_snapshot(data)
+    
+    def compact(self):
+        """Fold the journal into a new database.json snapshot"""
+        with self._file_lock(), self._cache_lock:
+            self._write_snapshot(self._load())
     
     def _save(self, data):
         """Save data to file"""
-        with open(self.db_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        with self._file_lock(), self._cache_lock:
+            self._write_snapshot(data)
+    
+    def _write_snapshot(self, data):
+        """Atomically replace db_file with data and empty the journal"""
+        # Write a temp file and rename it over the old one, so readers never
+        # see a half-written file and every save gets a fresh inode
+        tmp_file = f"{self.db_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f, indent=2)
+                if self.journal:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_file, self.db_file)
+        except Exception:
+            self._cache = None
+            self._cache_signature = None
+            raise
+        
+        # Replaying the old journal over the new snapshot would be harmless
+        # (records only set values), so a crash before this point is safe
+        if self.journal and os.path.exists(self.journal_file):
+            os.truncate(self.journal_file, 0)
+        
+        self._cache = data
+        self._cache_signature = self._file_signature()
+        self._journal_offset = 0
     
     def _hash_password(self, password):
         """Convert password to secure hash"""
@@ -423,34 +1466,35 @@ class Database:
         except:
             return False
     
-    def create_user_sqlite(self, email, password, name):
-        """Save new user to SQLite"""
-        data = self._load()
-        
-        if email in data["users"]:
-            return False, "User already exists"
-        
-        data["users"][email] = {
-            "email": email,
-            "password": self._hash_password(password),
-            "name": name,
-            "created_at": datetime.now().isoformat(),
-            "auth_type": "google" if password == 'GOOGLE_AUTH_USER' else "local",
-            "financial_data": {}
-        }
+    def create_user_json(self, email, password, name):
+        """Save new user to JSON file"""
+        with self._user_lock(email):
+            if self._read_user(email) is not None:
+                return False, "User already exists"
+            
+            user = {
+                "email": email,
+                "password": self._hash_password(password),
+                "name": name,
+                "created_at": datetime.now().isoformat(),
+                "auth_type": "google" if password == 'GOOGLE_AUTH_USER' else "local",
+                "financial_data": {},
+                "fy_aggregates": {}
+            }
+            
+            self._write_user(email, user, [([], user)])
         
-        self._save(data)
+        if self.backend == "sharded":
+            self._add_to_index(email)
         return True, "User created successfully"
     
-    def verify_user_sqlite(self, email, password):
-        """Check if login is correct for SQLite"""
-        data = self._load()
+    def verify_user_json(self, email, password):
+        """Check if login is correct for JSON file"""
+        user = self._read_user(email)
         
-        if email not in data["users"]:
+        if user is None:
             return False, "User not found"
         
-        user = data["users"][email]
-        
         if user.get('auth_type') == 'google':
             return False, "Please login with Google"
         
@@ -459,112 +1503,279 @@ class Database:
         
         return False, "Wrong password"
     
-    def get_user_sqlite(self, email):
-        """Get user details from SQLite"""
-        data = self._load()
-        return data["users"].get(email)
+    def get_user_json(self, email):
+        """Get user details from JSON file"""
+        return self._read_user(email)
     
-    def save_monthly_record_sqlite(self, email, month_data):
-        """Save monthly record to SQLite"""
-        data = self._load()
-        
-        if email not in data["users"]:
-            return False, "User not found"
-        
-        month_key = month_data.get("month")
-        if not month_key:
-            return False, "Month not specified"
-        
-        if "financial_data" not in data["users"][email]:
-            data["users"][email]["financial_data"] = {}
-        
-        from app import calculate_financial_year
-        financial_year = calculate_financial_year(month_key)
-        
-        data["users"][email]["financial_data"][month_key] = {
-            "income": month_data.get("income", 0),
-            "employer": month_data.get("employer", ""),
-            "date": month_data.get("date", ""),
-            "deductions": month_data.get("deductions", 0),
-            "net_pay": month_data.get("net_pay", 0),
-            "hra": month_data.get("hra", {}),
-            "investments": {
-                "ppf": month_data.get("investments", {}).get("ppf", 0),
-                "elss": month_data.get("investments", {}).get("elss", 0),
-                "life_insurance": month_data.get("investments", {}).get("life_insurance", 0),
-                "nsc": month_data.get("investments", {}).get("nsc", 0)
-            },
-            "insurance": {
-                "self": month_data.get("insurance", {}).get("self", 0),
-                "parents": month_data.get("insurance", {}).get("parents", 0)
-            },
-            "tax_paid": month_data.get("tax_paid", 0),
-            "timestamp": datetime.now().isoformat(),
-            "financial_year": financial_year
-        }
-        
-        self._save(data)
+    def save_monthly_record_json(self, email, month_data):
+        """Save monthly record to JSON file"""
+        with self._user_lock(email):
+            user = self._read_user_for_update(email)
+            
+            if user is None:
+                return False, "User not found"
+            
+            month_key, financial_year, month_entry = self._month_entry(month_data)
+            if not month_key:
+                return False, "Month not specified"
+            
+            if "financial_data" not in user:
+                user["financial_data"] = {}
+            
+            user["financial_data"][month_key] = month_entry
+            
+            changes = [(["financial_data", month_key], user["financial_data"][month_key])]
+            changes += self._record_write_json(user, [month_key])
+            self._write_user(email, user, changes)
         return True, "Monthly record saved"
     
-    def get_user_monthly_data_sqlite(self, email, month=None):
-        """Get monthly data from SQLite"""
-        data = self._load()
+    def save_monthly_records_json(self, email, entries):
+        """Save several months to the JSON file with a single write"""
+        with self._user_lock(email):
+            user = self._read_user_for_update(email)
+            
+            if user is None:
+                return False, "User not found"
+            
+            if "financial_data" not in user:
+                user["financial_data"] = {}
+            
+            changes = []
+            for month_key, (financial_year, month_entry) in entries.items():
+                user["financial_data"][month_key] = month_entry
+                changes.append((["financial_data", month_key], month_entry))
+            
+            changes += self._record_write_json(user, entries)
+            self._write_user(email, user, changes)
+        return True, f"{len(entries)} monthly records saved"
+    
+    def get_user_monthly_data_json(self, email, month=None):
+        """Get monthly data from JSON file"""
+        user = self._read_user(email)
         
-        if email not in data["users"]:
+        if user is None:
             return {} if month else []
         
-        financial_data = data["users"][email].get("financial_data", {})
+        financial_data = user.get("financial_data", {})
         
         if month:
             return financial_data.get(month, {})
         
         return financial_data
     
-    def update_monthly_investments_sqlite(self, email, month, investment_data):
-        """Update investments in SQLite"""
-        data = self._load()
-        
-        if email not in data["users"]:
-            return False, "User not found"
-        
-        if "financial_data" not in data["users"][email] or month not in data["users"][email]["financial_data"]:
-            return False, "Month data not found"
+    def update_monthly_investments_json(self, email, month, investment_data):
+        """Update investments in JSON file"""
+        with self._user_lock(email):
+            user = self._read_user_for_update(email)
+            
+            if user is None:
+                return False, "User not found"
+            
+            if "financial_data" not in user or month not in user["financial_data"]:
+                return False, "Month data not found"
+            
+            if "investments" not in user["financial_data"][month]:
+                user["financial_data"][month]["investments"] = {}
+            
+            for key, value in investment_data.items():
+                user["financial_data"][month]["investments"][key] = value
+            
+            self._write_user(email, user, [(["financial_data", month, "investments"],
+                                            user["financial_data"][month]["investments"])]
+                             + self._record_write_json(user, [month]))
+        return True, "Investments updated"
+    
+    def save_tax_analysis_json(self, email, month, answers, results):
+        """Save tax analysis to JSON file"""
+        with self._user_lock(email):
+            user = self._read_user_for_update(email)
+            
+            if user is None:
+                return False
+            
+            if "financial_data" not in user:
+                user["financial_data"] = {}
+            
+            if month not in user["financial_data"]:
+                user["financial_data"][month] = {}
+            
+            financial_year = calculate_financial_year(month)
+            
+            user["financial_data"][month]["tax_analysis"] = {
+                "status": "completed",
+                "last_calculated": datetime.now().isoformat(),
+                "answers": answers,
+                "results": results,
+                "financial_year": financial_year
+            }
+            
+            self._write_user(email, user, [(["financial_data", month, "tax_analysis"],
+                                            user["financial_data"][month]["tax_analysis"])]
+                             + self._record_write_json(user, [month]))
+        return True
+    
+    def _record_write_json(self, user, month_keys):
+        """Bump data_version and refresh these months in user["fy_aggregates"]; returns the changes to write"""
+        user["data_version"] = user.get("data_version", 0) + 1
+        changes = [(["data_version"], user["data_version"])]
         
-        if "investments" not in data["users"][email]["financial_data"][month]:
-            data["users"][email]["financial_data"][month]["investments"] = {}
+        aggregates = user.get("fy_aggregates")
+        if aggregates is None:
+            # Older record: built in full on the next dashboard read
+            return changes
         
-        for key, value in investment_data.items():
-            data["users"][email]["financial_data"][month]["investments"][key] = value
+        for financial_year, months in fy_contributions(
+            {month_key: user["financial_data"][month_key] for month_key in month_keys}
+        ).items():
+            aggregates.setdefault(financial_year, {}).update(months)
+            changes.append((["fy_aggregates", financial_year], aggregates[financial_year]))
+        return changes
+    
+    def get_fy_aggregates_json(self, email):
+        """Get dashboard aggregates from the JSON file"""
+        user = self._read_user(email)
+        if user is None:
+            return {}
+        if "fy_aggregates" in user:
+            return user["fy_aggregates"]
         
-        self._save(data)
-        return True, "Investments updated"
+        log.debug("📊 Building dashboard aggregates for %s", email)
+        with self._user_lock(email):
+            user = self._read_user_for_update(email)
+            user["fy_aggregates"] = fy_contributions(user.get("financial_data", {}))
+            self._write_user(email, user, [(["fy_aggregates"], user["fy_aggregates"])])
+        return user["fy_aggregates"]
     
-    def save_tax_analysis_sqlite(self, email, month, answers, results):
-        """Save tax analysis to SQLite"""
-        data = self._load()
+    def rebuild_fy_aggregates_json(self, email=None):
+        """Recompute JSON aggregates for one user or all"""
+        if self.backend == "sharded":
+            if email:
+                emails = [email]
+            else:
+                try:
+                    with open(os.path.join(self.shard_dir, "index.json"), 'r') as f:
+                        emails = list(json.load(f)["users"])
+                except (OSError, ValueError):
+                    emails = []
+            
+            rebuilt = 0
+            for user_email in emails:
+                with self._user_lock(user_email):
+                    user = self._read_user_for_update(user_email)
+                    if user is None:
+                        continue
+                    user["fy_aggregates"] = fy_contributions(user.get("financial_data", {}))
+                    user["data_version"] = user.get("data_version", 0) + 1
+                    self._write_user(user_email, user, [(["fy_aggregates"], user["fy_aggregates"]),
+                                                        (["data_version"], user["data_version"])])
+                rebuilt += 1
+            return rebuilt
         
-        if email not in data["users"]:
-            return False
+        # Single file: every user in one write
+        with self._file_lock():
+            data = self._load()
+            emails = [email] if email else list(data["users"])
+            changes = []
+            rebuilt = 0
+            for user_email in emails:
+                user = data["users"].get(user_email)
+                if user is None:
+                    continue
+                changes.append((["users", user_email, "fy_aggregates"],
+                                fy_contributions(user.get("financial_data", {}))))
+                changes.append((["users", user_email, "data_version"], user.get("data_version", 0) + 1))
+                rebuilt += 1
+            if changes:
+                self._commit(changes)
+        return rebuilt
+    
+    # ========== USER RECORDS (SINGLE FILE OR SHARDED) ==========
+    
+    def _shard_path(self, email):
+        """Per-user file in the sharded layout; hashed so any email is a safe filename"""
+        digest = hashlib.sha256(email.encode()).hexdigest()[:32]
+        return os.path.join(self.shard_dir, "users", f"{digest}.json")
+    
+    def _user_lock(self, email):
+        """Cross-process lock around one user's read-modify-write"""
+        if self.backend == "sharded":
+            # Writers for different users never contend
+            return self._flock(self._shard_path(email) + ".lock")
+        return self._file_lock()
+    
+    def _read_user(self, email):
+        """Return one user's record, or None"""
+        if self.backend != "sharded":
+            return self._load()["users"].get(email)
         
-        if "financial_data" not in data["users"][email]:
-            data["users"][email]["financial_data"] = {}
+        # Same signature-validated cache as _load(), one entry per user file
+        path = self._shard_path(email)
+        try:
+            st = os.stat(path)
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            self._shard_cache.pop(email, None)
+            return None
         
-        if month not in data["users"][email]["financial_data"]:
-            data["users"][email]["financial_data"][month] = {}
+        with self._cache_lock:
+            cached = self._shard_cache.get(email)
+            if cached and cached[0] == signature:
+                return cached[1]
+            try:
+                with open(path, 'r') as f:
+                    user = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._shard_cache[email] = (signature, user)
+            return user
+    
+    def _read_user_for_update(self, email):
+        """Private copy of one user's record (or None) to change and _write_user();
+        call it under _user_lock(email)"""
+        return copy.deepcopy(self._read_user(email))
+    
+    def _write_user(self, email, user, changes):
+        """Persist one user's record.
         
-        from app import calculate_financial_year
-        financial_year = calculate_financial_year(month)
+        changes lists the (path, value) pairs that were modified, relative to
+        the user record; the single-file layout commits just those, the
+        sharded layout rewrites the user's own file.
+        """
+        if self.backend != "sharded":
+            self._commit([(["users", email] + path, value) for path, value in changes])
+            return
         
-        data["users"][email]["financial_data"][month]["tax_analysis"] = {
-            "status": "completed",
-            "last_calculated": datetime.now().isoformat(),
-            "answers": answers,
-            "results": results,
-            "financial_year": financial_year
-        }
+        path = self._shard_path(email)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(user, f, separators=(',', ':'))
+            os.replace(tmp_file, path)
+        except Exception:
+            self._shard_cache.pop(email, None)
+            raise
         
-        self._save(data)
-        return True
+        st = os.stat(path)
+        with self._cache_lock:
+            self._shard_cache[email] = ((st.st_ino, st.st_mtime_ns, st.st_size), user)
+    
+    def _add_to_index(self, *emails):
+        """Record new users in the sharded layout's index.json"""
+        index_file = os.path.join(self.shard_dir, "index.json")
+        with self._flock(index_file + ".lock"):
+            try:
+                with open(index_file, 'r') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {"users": {}}
+            
+            for email in emails:
+                index["users"][email] = os.path.basename(self._shard_path(email))
+            
+            tmp_file = f"{index_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_file, index_file)
 
 # Create global database instance
 db = Database()
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""Indian financial-year calendar helpers shared by app.py and database.py.
+
+Month keys look like 'April 2025'. Lookups are cached and keys are interned,
+so parsing the same month again is a dict hit rather than a string split.
+"""
+import sys
+from functools import lru_cache
+
+MONTH_NAMES = (
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December'
+)
+
+# 'april' -> 4, case-insensitive because OCR text is not
+MONTH_NUMBERS = {name.lower(): number for number, name in enumerate(MONTH_NAMES, 1)}
+
+# The financial year starts in April
+FY_START_MONTH = 4
+
+
+def month_key(month_num, year):
+    """Build the canonical, interned key for a month (e.g. 4, 2025 -> 'April 2025')"""
+    return sys.intern(f"{MONTH_NAMES[int(month_num) - 1]} {int(year)}")
+
+
+@lru_cache(maxsize=4096)
+def parse_month_key(key):
+    """'April 2025' -> (2025, 4), or None if the key is not 'Month YYYY'"""
+    if not key:
+        return None
+    parts = key.split()
+    if len(parts) != 2 or not parts[1].isdigit():
+        return None
+    # Unknown month names map to 0, which the FY rule below treats as Jan-Mar
+    return int(parts[1]), MONTH_NUMBERS.get(parts[0].lower(), 0)
+
+
+@lru_cache(maxsize=4096)
+def month_ordinal(key):
+    """Months since year 0 (e.g. 'April 2025' -> 24303), for chronological ordering"""
+    parsed = parse_month_key(key)
+    if not parsed or not parsed[1]:
+        return None
+    year, month = parsed
+    return year * 12 + month - 1
+
+
+@lru_cache(maxsize=4096)
+def financial_year(key):
+    """Convert month name to financial year (e.g., 'April 2025' -> '2025-26')"""
+    parsed = parse_month_key(key)
+    if not parsed:
+        return None
+    year, month = parsed
+    start = year if month >= FY_START_MONTH else year - 1
+    return sys.intern(f"{start}-{str(start + 1)[-2:]}")
+
+
+def sort_key(key):
+    """Sort key putting months in date order; unparseable keys go last"""
+    ordinal = month_ordinal(key)
+    return (ordinal is None, ordinal or 0, key)
+
+
+def sort_months(keys, reverse=False):
+    """Return month keys in chronological order"""
+    return sorted(keys, key=sort_key, reverse=reverse)
+
+
+def group_by_financial_year(keys):
+    """{'2025-26': ['April 2025', 'May 2025', ...]} with each list in date order"""
+    groups = {}
+    for key in sort_months(keys):
+        fy = financial_year(key)
+        if fy:
+            groups.setdefault(fy, []).append(key)
+    return groups
@@ -0,0 +1,104 @@
+"""Conditional GET and a response cache for the per-user read APIs.
+
+Every write bumps the user's data version in the database, so
+(user, version, endpoint, args) identifies a response exactly. The ETag is
+a hash of that key: a matching If-None-Match gets a 304 without running the
+view, and a miss is served from an in-process LRU when the same response was
+built before. Each worker has its own cache; the ETags agree across workers.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, make_response, Response
+
+# Responses kept per worker process
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '1024'))
+
+
+class ResponseCache:
+    """Thread-safe LRU of (body, mimetype) keyed by (user, version, endpoint, args)"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache()
+
+
+def make_etag(key):
+    """Strong ETag value for a cache key"""
+    return hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+
+
+def versioned_response(get_version):
+    """Decorate a logged-in GET view with ETags, 304s and the response cache.
+
+    get_version(email) returns the user's data version, or None to bypass
+    (unknown user). Requests without a session go straight to the view so it
+    can answer 401 itself; only 200 responses are cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            email = session.get('user_email')
+            version = get_version(email) if email else None
+            if version is None:
+                return view(*args, **kwargs)
+
+            key = (email, version, request.endpoint,
+                   tuple(sorted(kwargs.items())),
+                   tuple(sorted(request.args.items(multi=True))))
+            etag = make_etag(key)
+
+            # Client already has this version: skip the view entirely
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                entry = response_cache.get(key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    response_cache.put(key, (response.get_data(), response.mimetype))
+                else:
+                    response = Response(entry[0], mimetype=entry[1])
+
+            response.set_etag(etag)
+            # Always revalidate; the body is per-user
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
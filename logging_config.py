@@ -0,0 +1,93 @@
+"""Logging setup for the app: levels, plain or JSON lines, optional background writer.
+
+LOG_LEVEL     DEBUG / INFO / WARNING / ERROR (default INFO)
+LOG_FORMAT    'text' (default) or 'json', one object per line
+LOG_QUEUE     '1' to hand records to a background thread, so request
+              threads never block on stdout
+
+Use get_logger(__name__) and pass values as arguments
+(log.debug("Month %s", key)) so disabled levels cost no formatting.
+Never log payslip amounts, parsed results or OAuth state.
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_QUEUE = os.getenv('LOG_QUEUE', '').lower() in ('1', 'true', 'yes')
+
+ROOT_LOGGER = 'tax_advisor'
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; extra={...} fields become keys"""
+
+    # Attributes every LogRecord has, i.e. not passed through extra=
+    _RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in self._RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_listener = None
+
+
+def _start_listener(log_queue, handler):
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_listener_after_fork():
+    # The writer thread does not survive fork (gunicorn --preload)
+    if _listener is not None:
+        _start_listener(_listener.queue, *_listener.handlers)
+
+
+def configure_logging():
+    """Set up the app's root logger once; later calls return it unchanged"""
+    logger = logging.getLogger(ROOT_LOGGER)
+    if logger.handlers:
+        return logger
+
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    if LOG_QUEUE:
+        # Request threads only enqueue; one thread writes
+        log_queue = queue.SimpleQueue()
+        _start_listener(log_queue, handler)
+        atexit.register(lambda: _listener.stop())
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_restart_listener_after_fork)
+        handler = logging.handlers.QueueHandler(log_queue)
+
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name):
+    """Logger under the app's root, e.g. get_logger('app') -> 'tax_advisor.app'"""
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -0,0 +1,289 @@
+"""Request, storage and OCR metrics in the Prometheus text format.
+
+init_app() times every request per route and records its status and
+response size. instrument_storage() wraps the Database methods so each
+request also reports how many storage calls it made and how long they took.
+Metrics are kept per worker process, so scrape each worker (or run a single
+worker) to see everything.
+"""
+import os
+import time
+import threading
+import requests
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, request, has_request_context, Response, abort
+from logging_config import get_logger
+
+log = get_logger('metrics')
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Storage calls per request
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+# Optional bearer token for /metrics
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label tuple"""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        series[1] += 1
+        series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, count, total) in sorted(self._series.items()):
+            base = _labels(self.label_names, labels)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, ("le", _number(bound)))} {bucket_count}')
+            lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, ("le", "+Inf"))} {count}')
+            lines.append(f"{self.name}_count{base} {count}")
+            lines.append(f"{self.name}_sum{base} {_number(total)}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter, one series per label tuple"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}
+
+    def inc(self, labels, amount=1):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+# All updates go through this lock; observations are a few dict operations
+_lock = threading.Lock()
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route",
+    ("route", "method"), LATENCY_BUCKETS)
+REQUESTS = Counter(
+    "http_requests_total", "Requests by route and status code",
+    ("route", "method", "status"))
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size by route",
+    ("route",), SIZE_BUCKETS)
+STORAGE_LATENCY = Histogram(
+    "storage_call_duration_seconds", "Database method latency",
+    ("method",), LATENCY_BUCKETS)
+STORAGE_ERRORS = Counter(
+    "storage_call_errors_total", "Database methods that raised",
+    ("method",))
+STORAGE_CALLS_PER_REQUEST = Histogram(
+    "storage_calls_per_request", "Database method calls made by one request",
+    ("route",), COUNT_BUCKETS)
+STORAGE_SECONDS_PER_REQUEST = Histogram(
+    "storage_seconds_per_request", "Time one request spent in database methods",
+    ("route",), LATENCY_BUCKETS)
+OCR_LATENCY = Histogram(
+    "ocr_upstream_duration_seconds", "OCR provider round trip",
+    ("provider", "outcome"), LATENCY_BUCKETS)
+OCR_PREPROCESS_LATENCY = Histogram(
+    "ocr_preprocess_duration_seconds", "Time spent shrinking an image before OCR",
+    ("outcome",), LATENCY_BUCKETS)
+OCR_UPLOAD_SIZE = Histogram(
+    "ocr_upload_size_bytes", "Image size as uploaded and as sent to OCR",
+    ("stage",), SIZE_BUCKETS)
+OCR_BYTES_SAVED = Counter(
+    "ocr_preprocess_bytes_saved_total", "Bytes not sent to OCR thanks to preprocessing",
+    ())
+OCR_RETRIES = Counter(
+    "ocr_upstream_retries_total", "OCR provider calls retried, by reason",
+    ("provider", "reason"))
+
+_METRICS = [REQUEST_LATENCY, REQUESTS, RESPONSE_SIZE, STORAGE_LATENCY, STORAGE_ERRORS,
+            STORAGE_CALLS_PER_REQUEST, STORAGE_SECONDS_PER_REQUEST, OCR_LATENCY, OCR_RETRIES,
+            OCR_PREPROCESS_LATENCY, OCR_UPLOAD_SIZE, OCR_BYTES_SAVED]
+
+# Values read from elsewhere at scrape time: name -> (help, labels, collect, type)
+_gauges = {}
+
+
+def register_gauge(name, help_text, label_names, collect, metric_type="gauge"):
+    """Add a metric computed when /metrics is scraped; collect() returns {label tuple: value}"""
+    _gauges[name] = (help_text, label_names, collect, metric_type)
+
+
+def _route():
+    """Route template ('/api/monthly-data/<month>'), so labels stay bounded"""
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.storage_calls = 0
+    g.storage_seconds = 0.0
+
+
+def _after_request(response):
+    start = g.get('metrics_start')
+    if start is None:
+        return response
+
+    elapsed = time.perf_counter() - start
+    route = _route()
+    # Streamed responses have no known length
+    size = response.calculate_content_length()
+    with _lock:
+        REQUEST_LATENCY.observe((route, request.method), elapsed)
+        REQUESTS.inc((route, request.method, str(response.status_code)))
+        if size is not None:
+            RESPONSE_SIZE.observe((route,), size)
+        STORAGE_CALLS_PER_REQUEST.observe((route,), g.storage_calls)
+        STORAGE_SECONDS_PER_REQUEST.observe((route,), g.storage_seconds)
+    return response
+
+
+# Nested Database calls (get_all_months_list -> get_user_monthly_data) count once
+_depth = threading.local()
+
+
+def _timed_storage(name, method):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_depth, 'value', 0)
+        if depth:
+            return method(*args, **kwargs)
+
+        _depth.value = 1
+        start = time.perf_counter()
+        failed = False
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _depth.value = 0
+            elapsed = time.perf_counter() - start
+            with _lock:
+                STORAGE_LATENCY.observe((name,), elapsed)
+                if failed:
+                    STORAGE_ERRORS.inc((name,))
+            if has_request_context() and 'storage_calls' in g:
+                g.storage_calls += 1
+                g.storage_seconds += elapsed
+    return wrapper
+
+
+def instrument_storage(database_class, method_names):
+    """Time the given Database methods for every instance"""
+    for name in method_names:
+        method = getattr(database_class, name)
+        if not getattr(method, '_metrics_wrapped', False):
+            wrapped = _timed_storage(name, method)
+            wrapped._metrics_wrapped = True
+            setattr(database_class, name, wrapped)
+
+
+@contextmanager
+def ocr_timer(provider="ocr.space"):
+    """Time one upstream OCR call: with metrics.ocr_timer(): requests.post(...)"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except requests.Timeout:
+        outcome = "timeout"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        with _lock:
+            OCR_LATENCY.observe((provider, outcome), time.perf_counter() - start)
+
+
+def ocr_retry(reason, provider="ocr.space"):
+    """Count one retried upstream OCR attempt (reason: 'timeout', 'connect', '503', ...)"""
+    with _lock:
+        OCR_RETRIES.inc((provider, reason))
+
+
+def ocr_preprocessed(stats):
+    """Record one image_prep.prepare_for_ocr() result"""
+    with _lock:
+        OCR_PREPROCESS_LATENCY.observe((stats["outcome"],), stats["seconds"])
+        OCR_UPLOAD_SIZE.observe(("uploaded",), stats["original_bytes"])
+        OCR_UPLOAD_SIZE.observe(("sent",), stats["sent_bytes"])
+        OCR_BYTES_SAVED.inc((), stats["original_bytes"] - stats["sent_bytes"])
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        lines = []
+        for metric in _METRICS:
+            lines.extend(metric.render())
+
+    for name, (help_text, label_names, collect, metric_type) in _gauges.items():
+        try:
+            values = collect()
+        except Exception as e:
+            log.error("❌ Metrics gauge %s error: %s", name, e)
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(values.items()):
+            lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _metrics_view():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        abort(401)
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Install the request hooks and the /metrics endpoint"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', _metrics_view)
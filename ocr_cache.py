@@ -0,0 +1,212 @@
+"""Cache of OCR results keyed by the image's content.
+
+The same payslip gets uploaded again and again (retries, re-analyze,
+dashboard modal and upload page). The key is the SHA-256 of the image bytes
+plus the parser version (app.py adds the image preparation settings and
+the OCR engine that read it), so an identical image skips OCR. Bumping
+PARSER_VERSION in app.py makes every older entry a miss. Each worker
+keeps an in-process LRU. OCR_CACHE_DIR adds a disk tier that is shared by
+the workers and survives restarts.
+
+OCR_CACHE_SIZE        entries kept in memory per worker (default 256, 0 = off)
+OCR_CACHE_TTL         seconds an entry stays valid (default 7 days)
+OCR_CACHE_DIR         directory for the disk tier (default: no disk tier)
+OCR_CACHE_DISK_MAX    entries kept on disk (default 5000)
+
+Entries hold the payslip text and parsed fields, so the disk tier is
+created private to the app's user.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from logging_config import get_logger
+
+log = get_logger('ocr_cache')
+
+OCR_CACHE_SIZE = int(os.getenv('OCR_CACHE_SIZE', '256'))
+OCR_CACHE_TTL = int(os.getenv('OCR_CACHE_TTL', str(7 * 24 * 3600)))
+OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR')
+OCR_CACHE_DISK_MAX = int(os.getenv('OCR_CACHE_DISK_MAX', '5000'))
+
+# Check the disk tier's size every this many writes, not on every one
+_PRUNE_EVERY = 64
+
+# A .tmp file younger than this is another writer's entry in progress;
+# older ones were left by a crash and are removed
+_TMP_MAX_AGE = 60
+
+
+def content_key(image, parser_version):
+    """Cache key for an image (bytes, or its SHA-256 hex digest) and the parser that read it"""
+    digest = image if isinstance(image, str) else hashlib.sha256(image).hexdigest()
+    return f"{digest}-v{parser_version}"
+
+
+class OcrCache:
+    """LRU with TTL in memory, backed by JSON files in directory when given"""
+
+    def __init__(self, max_entries=OCR_CACHE_SIZE, ttl=OCR_CACHE_TTL,
+                 directory=OCR_CACHE_DIR, disk_max_entries=OCR_CACHE_DISK_MAX):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.disk_max_entries = disk_max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def _remember(self, key, entry):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, key, now):
+        """(value, 'memory' or 'disk'), or (None, None) if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry["created"] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry["value"], "memory"
+                del self._entries[key]
+
+        entry = self._read_disk(key, now)
+        if entry is None:
+            return None, None
+        with self._lock:
+            self._remember(key, entry)
+        return entry["value"], "disk"
+
+    def _count(self, tier):
+        with self._lock:
+            if tier == "memory":
+                self.hits += 1
+            elif tier == "disk":
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """The cached value for key, or None if missing or expired"""
+        value, tier = self._lookup(key, time.time())
+        self._count(tier)
+        return value
+
+    def get_first(self, keys):
+        """(key, value) for the first of keys that is cached, or (None, None).
+
+        Counts as one lookup in the stats, however many keys are tried.
+        """
+        now = time.time()
+        for key in keys:
+            value, tier = self._lookup(key, now)
+            if tier is not None:
+                self._count(tier)
+                return key, value
+        self._count(None)
+        return None, None
+
+    def put(self, key, value):
+        entry = {"created": time.time(), "value": value}
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def _read_disk(self, key, now):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - entry.get("created", 0) > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _write_disk(self, key, entry):
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            # Write then rename, so other workers never read half a file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("❌ OCR cache write error: %s", e)
+            return
+
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % _PRUNE_EVERY == 0
+        if prune:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Drop expired entries, the oldest ones beyond disk_max_entries, and
+        temporary files left by crashed writers"""
+        if not self.directory:
+            return 0
+        now = time.time()
+        files = []
+        leftovers = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                if name.endswith('.tmp'):
+                    # Removing one mid-write would make its os.replace() fail
+                    if now - mtime > _TMP_MAX_AGE:
+                        leftovers.append(path)
+                    continue
+                files.append((mtime, path))
+        files.sort()
+        excess = len(files) - self.disk_max_entries
+        doomed = leftovers + [path for i, (mtime, path) in enumerate(files)
+                              if i < excess or now - mtime > self.ttl]
+        removed = 0
+        for path in doomed:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits,
+                    "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+ocr_cache = OcrCache()
@@ -0,0 +1,410 @@
+"""OCR engines and the router that picks one for each call.
+
+OCR_ENGINES           engines to use, in order of preference (default 'ocrspace')
+                      ocrspace   OCR.space API (needs OCR_SPACE_API_KEY)
+                      tesseract  local Tesseract: pip install pytesseract, plus
+                                 the tesseract binary (apt install tesseract-ocr)
+                      fixture    deterministic stand-in for tests and benchmarks,
+                                 no network
+OCR_SLOW_SECONDS      an engine averaging more than this is tried last (default 15)
+OCR_ENGINE_COOLDOWN   seconds a slow or failing engine stays at the back (default 60)
+
+The router tries engines in order and falls through to the next when one
+raises OcrError. Each engine's recent latency is tracked as a moving
+average. An engine that fails, or averages over OCR_SLOW_SECONDS, moves to
+the back of the queue for OCR_ENGINE_COOLDOWN; after that the next call
+tries it again with a fresh average. With "ocrspace,tesseract", a slow or
+unreachable OCR.space is bypassed for a minute at a time.
+
+OCR_FIXTURE_DIR       <sha256 of the image sent>.txt files the fixture engine
+                      returns as-is (form feeds split pages)
+OCR_FIXTURE_LATENCY   seconds the fixture engine sleeps per call (default 0)
+"""
+import io
+import os
+import time
+import random
+import shutil
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import ReadTimeoutError
+from PIL import Image
+import metrics
+from logging_config import get_logger
+
+try:
+    import pytesseract
+except ImportError:  # optional: the tesseract engine is then unavailable
+    pytesseract = None
+
+log = get_logger('ocr')
+
+OCR_ENGINES = os.getenv('OCR_ENGINES', 'ocrspace')
+OCR_SLOW_SECONDS = float(os.getenv('OCR_SLOW_SECONDS', '15'))
+OCR_ENGINE_COOLDOWN = float(os.getenv('OCR_ENGINE_COOLDOWN', '60'))
+
+OCR_SPACE_API_KEY = os.getenv('OCR_SPACE_API_KEY')
+OCR_CONNECT_TIMEOUT = float(os.getenv('OCR_CONNECT_TIMEOUT', '5'))
+OCR_READ_TIMEOUT = float(os.getenv('OCR_READ_TIMEOUT', '60'))
+OCR_RETRIES = int(os.getenv('OCR_RETRIES', '2'))
+
+OCR_FIXTURE_DIR = os.getenv('OCR_FIXTURE_DIR')
+OCR_FIXTURE_LATENCY = float(os.getenv('OCR_FIXTURE_LATENCY', '0'))
+
+# Weight of the newest call in an engine's latency average
+LATENCY_SMOOTHING = 0.3
+
+
+class OcrError(Exception):
+    """The OCR engine could not read the image"""
+
+
+def _read(file_data):
+    """Bytes from bytes or a binary file (rewound first)"""
+    if isinstance(file_data, (bytes, bytearray)):
+        return bytes(file_data)
+    file_data.seek(0)
+    return file_data.read()
+
+
+class OcrEngine(ABC):
+    """One way of turning an image (or PDF) into text"""
+
+    name = None
+    supports_pdf = False
+
+    def available(self):
+        return True
+
+    @abstractmethod
+    def pages(self, file_data, filename='payslip.jpg', filetype=None):
+        """Text of each page of file_data (bytes or a binary file).
+
+        Raise OcrError for any failure, so the router can try the next
+        engine. Time the work with metrics.ocr_timer(self.name).
+        """
+
+
+# ========== OCR.SPACE ==========
+class OcrRetry(Retry):
+    """urllib3 Retry that counts each retried attempt in the metrics"""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if response is not None:
+            metrics.ocr_retry(str(response.status))
+        elif isinstance(error, ReadTimeoutError):
+            metrics.ocr_retry('timeout')
+        else:
+            metrics.ocr_retry('connect')
+        return new_retry
+
+
+class OcrSpaceEngine(OcrEngine):
+    """The OCR.space API over a pooled, retrying HTTP session"""
+
+    name = 'ocr.space'
+    supports_pdf = True
+    url = 'https://api.ocr.space/parse/image'
+
+    def __init__(self, api_key=OCR_SPACE_API_KEY, pool_size=10):
+        self.api_key = api_key
+        self.pool_size = pool_size
+        # No more calls in flight than pooled connections, or urllib3 opens
+        # extra ones and throws them away ("Connection pool is full")
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+    def available(self):
+        return bool(self.api_key)
+
+    def session(self):
+        """Keep-alive HTTP session for OCR.space, one per worker process.
+
+        Connections are reused across uploads, so only the first pays for the TLS
+        handshake. Connect errors, 429 and 5xx are retried with jittered
+        exponential backoff. A forked child builds its own session rather than
+        sharing the parent's sockets.
+        """
+        with self._session_lock:
+            if self._session is None or self._session_pid != os.getpid():
+                retry = OcrRetry(
+                    total=OCR_RETRIES,
+                    # A read timeout means OCR.space is slow, not flaky; trying again
+                    # would only make the user wait another OCR_READ_TIMEOUT
+                    read=0,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    # OCR.space keeps nothing from a request, so repeating the POST is safe
+                    allowed_methods=frozenset(['POST']),
+                    backoff_factor=0.5,
+                    backoff_jitter=0.5,
+                    backoff_max=10,
+                    respect_retry_after_header=True,
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=self.pool_size)
+                self._session = requests.Session()
+                self._session.mount('https://', adapter)
+                self._session_pid = os.getpid()
+            return self._session
+
+    def post(self, file_data, filename='payslip.jpg', filetype=None):
+        fields = {
+            'apikey': self.api_key,
+            'language': 'eng',
+            'isOverlayRequired': False,
+            'detectOrientation': True,
+            'scale': True,
+            'OCREngine': '2'
+        }
+        if filetype:
+            fields['filetype'] = filetype
+        try:
+            return self.session().post(
+                self.url,
+                data=fields,
+                files={'file': (filename, file_data)},
+                timeout=(OCR_CONNECT_TIMEOUT, OCR_READ_TIMEOUT)
+            )
+        except requests.ConnectionError as e:
+            # With a Retry configured, requests reports a read timeout as a
+            # ConnectionError; raise it as the timeout it is
+            if e.args and isinstance(getattr(e.args[0], 'reason', None), ReadTimeoutError):
+                raise requests.ReadTimeout(*e.args, request=e.request, response=e.response)
+            raise
+
+    def pages(self, file_data, filename='payslip.jpg', filetype=None):
+        try:
+            with self._slots, metrics.ocr_timer(self.name):
+                response = self.post(file_data, filename, filetype)
+        except requests.Timeout:
+            raise OcrError("OCR timed out, please try again")
+        except requests.ConnectionError:
+            raise OcrError("Could not reach the OCR service, please try again")
+        except requests.RequestException as e:
+            raise OcrError(f"OCR request failed ({e.__class__.__name__})")
+
+        if response.status_code >= 400:
+            raise OcrError(f"OCR failed: service returned HTTP {response.status_code}")
+
+        try:
+            ocr_result = response.json()
+        except ValueError:
+            ocr_result = None
+        if not isinstance(ocr_result, dict):
+            raise OcrError("OCR failed: service returned an unreadable response")
+
+        if ocr_result.get('IsErroredOnProcessing'):
+            error_msg = ocr_result.get('ErrorMessage') or 'Unknown error'
+            if isinstance(error_msg, list):
+                error_msg = error_msg[0]
+            raise OcrError(f"OCR failed: {error_msg}")
+
+        return [page.get('ParsedText') or '' for page in ocr_result.get('ParsedResults') or []]
+
+
+# ========== LOCAL TESSERACT ==========
+class TesseractEngine(OcrEngine):
+    """Tesseract on this machine; no network, but uses a CPU core per call"""
+
+    name = 'tesseract'
+
+    def __init__(self, max_concurrent=os.cpu_count() or 1):
+        # More parallel tesseract processes than cores only adds contention
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        # Looked up once; installing tesseract later needs a restart
+        self._binary = pytesseract and shutil.which(pytesseract.pytesseract.tesseract_cmd)
+
+    def available(self):
+        return bool(self._binary)
+
+    def pages(self, file_data, filename='payslip.jpg', filetype=None):
+        if filetype == 'PDF':
+            raise OcrError("Tesseract can't read PDFs")
+        try:
+            with self._slots, metrics.ocr_timer(self.name), Image.open(io.BytesIO(_read(file_data))) as image:
+                # psm 6: one uniform block of text, which suits a payslip table
+                return [pytesseract.image_to_string(image, lang='eng', config='--psm 6')]
+        except OcrError:
+            raise
+        except Exception as e:
+            raise OcrError(f"OCR failed: {e}")
+
+
+# ========== FIXTURE ==========
+FIXTURE_MONTHS = ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+                  'August', 'September', 'October', 'November', 'December')
+
+
+def fixture_payslip_text(seed):
+    """A payslip parse_payslip_text can read, the same every time for a seed"""
+    rnd = random.Random(seed)
+    earnings = rnd.randrange(30000, 200000, 500)
+    deductions = round(earnings * rnd.uniform(0.08, 0.25), -1)
+    return (
+        "Computer Solutions Pvt. Ltd. "
+        f"Payslip for {rnd.choice(FIXTURE_MONTHS)} {rnd.randint(2022, 2025)} "
+        f"Name: {rnd.choice(('Asha', 'Ravi', 'Meera', 'Arjun'))} {rnd.choice('KMRS')} "
+        f"Basic Pay {earnings * 0.5:,.2f} House Rent Allowance {earnings * 0.2:,.2f} "
+        f"Total Earnings {earnings:,.2f} Total Deductions {deductions:,.2f} "
+        f"Net Pay {earnings - deductions:,.2f}"
+    )
+
+
+class FixtureEngine(OcrEngine):
+    """Deterministic text per input, for tests, benchmarks and offline work.
+
+    A file in directory named after the input's SHA-256 (.txt) is returned
+    as-is; anything else gets a synthetic payslip seeded by that hash.
+    """
+
+    name = 'fixture'
+    supports_pdf = True
+
+    def __init__(self, directory=OCR_FIXTURE_DIR, latency=OCR_FIXTURE_LATENCY):
+        self.directory = directory
+        self.latency = latency
+
+    def pages(self, file_data, filename='payslip.jpg', filetype=None):
+        with metrics.ocr_timer(self.name):
+            digest = hashlib.sha256(_read(file_data)).hexdigest()
+            if self.latency:
+                time.sleep(self.latency)
+            if self.directory:
+                path = os.path.join(self.directory, digest + '.txt')
+                if os.path.exists(path):
+                    with open(path) as f:
+                        return f.read().split('\f')
+            return [fixture_payslip_text(digest)]
+
+
+# ========== ROUTING ==========
+ENGINES = {
+    'ocrspace': OcrSpaceEngine,
+    'ocr.space': OcrSpaceEngine,
+    'tesseract': TesseractEngine,
+    'fixture': FixtureEngine
+}
+
+
+class OcrRouter:
+    """Try engines in preference order, demoting slow or failing ones for a while"""
+
+    def __init__(self, engines, slow_seconds=OCR_SLOW_SECONDS, cooldown=OCR_ENGINE_COOLDOWN):
+        self.engines = engines
+        self.slow_seconds = slow_seconds
+        self.cooldown = cooldown
+        self._latency = {}
+        self._demoted_until = {}
+        self._lock = threading.Lock()
+
+    @property
+    def names(self):
+        """Names of the configured engines, most preferred first"""
+        return [engine.name for engine in self.engines]
+
+    @property
+    def engine_list(self):
+        """The configured engines as one string for messages, e.g. 'ocr.space+tesseract'"""
+        return "+".join(self.names)
+
+    def available(self):
+        return any(engine.available() for engine in self.engines)
+
+    def _order(self, filetype):
+        now = time.time()
+        ready, demoted = [], []
+        with self._lock:
+            for engine in self.engines:
+                if not engine.available() or (filetype == 'PDF' and not engine.supports_pdf):
+                    continue
+                until = self._demoted_until.get(engine.name)
+                if until is not None and until <= now:
+                    # Cooled down: judge it on fresh calls
+                    del self._demoted_until[engine.name]
+                    self._latency.pop(engine.name, None)
+                    until = None
+                if until is None:
+                    ready.append(engine)
+                else:
+                    demoted.append((until, engine))
+        return ready + [engine for _, engine in sorted(demoted, key=lambda item: item[0])]
+
+    def preferred(self, filetype=None):
+        """Name of the engine that would be asked first right now, or None"""
+        engines = self._order(filetype)
+        return engines[0].name if engines else None
+
+    def _record(self, engine, seconds, ok):
+        with self._lock:
+            average = self._latency.get(engine.name)
+            average = seconds if average is None else \
+                LATENCY_SMOOTHING * seconds + (1 - LATENCY_SMOOTHING) * average
+            self._latency[engine.name] = average
+            if (not ok or average > self.slow_seconds) and len(self.engines) > 1:
+                if engine.name not in self._demoted_until:
+                    log.warning("🐢 OCR engine %s %s; trying others first for %gs", engine.name,
+                                "failed" if not ok else f"averaging {average:.1f}s", self.cooldown)
+                self._demoted_until[engine.name] = time.time() + self.cooldown
+
+    def read(self, file_data, filename='payslip.jpg', filetype=None):
+        """(engine name, text of each page) from the first engine that succeeds; raises OcrError"""
+        engines = self._order(filetype)
+        if not engines:
+            if filetype == 'PDF':
+                raise OcrError("No OCR engine configured that reads PDFs")
+            raise OcrError("No OCR engine configured")
+
+        error = None
+        for engine in engines:
+            if hasattr(file_data, 'seek'):
+                # The engine before may have read some or all of it
+                file_data.seek(0)
+            start = time.perf_counter()
+            try:
+                pages = engine.pages(file_data, filename, filetype)
+            except OcrError as e:
+                self._record(engine, time.perf_counter() - start, ok=False)
+                error = e
+                continue
+            except Exception:
+                # A bug rather than a bad image or a down service; still a failure
+                self._record(engine, time.perf_counter() - start, ok=False)
+                raise
+            self._record(engine, time.perf_counter() - start, ok=True)
+            return engine.name, pages
+        raise error
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {engine.name: {
+                "available": engine.available(),
+                "latency": self._latency.get(engine.name),
+                "demoted": self._demoted_until.get(engine.name, 0) > now
+            } for engine in self.engines}
+
+
+def build_router(names=OCR_ENGINES, pool_size=10):
+    """OcrRouter for a comma-separated list of engine names; pool_size is
+    the number of OCR.space connections kept open, and calls in flight"""
+    engines = []
+    for name in (part.strip().lower() for part in names.split(',')):
+        if not name:
+            continue
+        engine_class = ENGINES.get(name)
+        if engine_class is None:
+            raise ValueError(f"Unknown OCR engine {name!r} (choose from {', '.join(sorted(ENGINES))})")
+        if engine_class is OcrSpaceEngine:
+            engines.append(OcrSpaceEngine(pool_size=pool_size))
+        else:
+            engines.append(engine_class())
+        if not engines[-1].available():
+            log.warning("⚠️ OCR engine %s is configured but not available", name)
+    return OcrRouter(engines)
@@ -0,0 +1,197 @@
+"""Background jobs for payslip OCR, so uploads don't hold a request thread.
+
+A request submits a job and gets an id back straight away. A bounded
+thread pool runs the OCR, and the page polls for the status and the result.
+Jobs can be cancelled: a queued job never starts (its cleanup runs
+instead, e.g. closing spooled uploads), and a running job stops at its
+next check_cancelled(). Jobs live in the memory of the worker
+process that accepted them. With several gunicorn workers, a poll can land
+on a worker that doesn't know the job and gets a 404. Run one worker with
+threads (gunicorn --workers 1 --threads 8) or use sticky sessions.
+
+OCR_WORKERS       jobs running at once per worker process (default 4)
+OCR_QUEUE_SIZE    jobs queued or running before submit() refuses (default 32)
+OCR_JOB_TTL       seconds a finished job is kept for polling (default 600)
+"""
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ocr_engines import OcrError
+from uploads import UploadError
+from pdf_pages import PdfError
+from logging_config import get_logger
+
+log = get_logger('ocr_jobs')
+
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '4'))
+OCR_QUEUE_SIZE = int(os.getenv('OCR_QUEUE_SIZE', '32'))
+OCR_JOB_TTL = int(os.getenv('OCR_JOB_TTL', '600'))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Failures whose message is meant for the user; anything else is a bug
+USER_ERRORS = (OcrError, UploadError, PdfError)
+
+
+class QueueFull(Exception):
+    """Too many jobs queued or running; the client should retry later"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function once the job has been cancelled"""
+
+
+class Job:
+    """One submitted task, its progress and its outcome"""
+
+    def __init__(self, owner, kind):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.kind = kind
+        self.status = QUEUED
+        self.progress = {"done": 0, "total": None}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+
+    def report(self, done, total=None):
+        """Progress for long jobs, e.g. pages OCRed out of the page count"""
+        self.progress = {"done": done, "total": total}
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Call between steps; stops the job if the user cancelled it"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def to_dict(self):
+        job = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "created": self.created
+        }
+        if self.status == DONE:
+            job["result"] = self.result
+        elif self.status == FAILED:
+            job["error"] = self.error
+        return job
+
+
+class JobQueue:
+    """Bounded pool of OCR workers plus the jobs it has run recently"""
+
+    def __init__(self, workers=OCR_WORKERS, max_pending=OCR_QUEUE_SIZE, ttl=OCR_JOB_TTL):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _executor(self):
+        # Created on first use, and again in a forked child (gunicorn --preload):
+        # the pool's threads don't survive fork
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ocr')
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def _expire(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and now - job.finished > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, owner, kind, fn, *args, cleanup=None):
+        """Run fn(job, *args) in the pool; its return value becomes job.result.
+
+        fn raises to fail the job; the message of an OcrError, UploadError or
+        PdfError is shown to the user. cleanup() runs if the job is cancelled
+        before fn starts, since fn can't release what it was given then.
+        """
+        with self._lock:
+            self._expire(time.time())
+            pending = sum(1 for job in self._jobs.values() if job.status not in FINISHED)
+            if pending >= self.max_pending:
+                raise QueueFull()
+            job = Job(owner, kind)
+            job.cleanup = cleanup
+            self._jobs[job.id] = job
+            job.future = self._executor().submit(self._run, job, fn, args)
+        return job
+
+    def _cancel_unstarted(self, job):
+        job.status = CANCELLED
+        job.finished = time.time()
+        if job.cleanup is not None:
+            try:
+                job.cleanup()
+            except Exception:
+                log.exception("❌ Cleanup of cancelled job %s failed", job.id)
+
+    def _run(self, job, fn, args):
+        if job.cancelled():
+            self._cancel_unstarted(job)
+            return
+        job.status = RUNNING
+        try:
+            result = fn(job, *args)
+            job.check_cancelled()
+            job.result = result
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except USER_ERRORS as e:
+            job.error = str(e)
+            job.status = FAILED
+        except Exception:
+            log.exception("❌ OCR job %s failed", job.id)
+            job.error = "Something went wrong, please try again"
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id, owner):
+        """The job if it exists and belongs to owner, else None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def cancel(self, job_id, owner):
+        """Cancel a queued or running job; returns the job, or None if unknown"""
+        job = self.get(job_id, owner)
+        if job is None:
+            return None
+        if job.status not in FINISHED:
+            job._cancel.set()
+            if job.future.cancel():
+                # Never started, so _run won't finish it
+                self._cancel_unstarted(job)
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+
+ocr_jobs = JobQueue()
@@ -0,0 +1,107 @@
+"""Split PDF payslips into pages for OCR.
+
+Uses pypdfium2 when it is installed (pip install pypdfium2). Payslips
+exported by payroll software usually have a text layer, and those pages are
+read directly without OCR. Scanned pages are rendered to grayscale JPEGs
+sized like image_prep's output. Without pypdfium2, available() is False and
+the caller sends the whole PDF to OCR.space instead. pdfium isn't
+thread-safe, so every call into it holds one lock for the whole process:
+OCR jobs and batch workers can read PDFs at the same time, and only their
+pdfium calls take turns.
+
+PDF_RENDER_DPI    resolution scanned pages are rendered at (default 200)
+PDF_MAX_PAGES     longest PDF accepted (default 36)
+"""
+import io
+import os
+import threading
+from image_prep import OCR_MAX_EDGE, OCR_JPEG_QUALITY
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # optional: PDFs then go to OCR.space whole
+    pdfium = None
+
+PDF_RENDER_DPI = int(os.getenv('PDF_RENDER_DPI', '200'))
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '36'))
+
+# A page with less embedded text than this is treated as a scan
+MIN_TEXT_CHARS = 40
+
+_pdfium_lock = threading.Lock()
+
+
+class PdfError(Exception):
+    """The PDF can't be read; str() is the message for the user"""
+
+
+def available():
+    return pdfium is not None
+
+
+def is_pdf(file):
+    """True if a binary file starts with the PDF signature (the file is rewound)"""
+    file.seek(0)
+    header = file.read(1024)
+    file.seek(0)
+    return b'%PDF-' in header
+
+
+def _render(page, dpi, max_edge):
+    """The page as a grayscale PIL image (call with _pdfium_lock held)"""
+    width, height = page.get_size()
+    # Points are 1/72 inch; never render bigger than image_prep would send
+    scale = min(dpi / 72, max_edge / max(width, height))
+    bitmap = page.render(scale=scale, grayscale=True)
+    try:
+        # A copy, so the image outlives the bitmap's buffer
+        return bitmap.to_pil().convert('L').copy()
+    finally:
+        bitmap.close()
+
+
+def _read_page(document, index, dpi, max_edge):
+    """(text, None) for a page with a text layer, (None, PIL image) for a scan"""
+    with _pdfium_lock:
+        page = document[index]
+        try:
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            textpage.close()
+            if len(text.strip()) >= MIN_TEXT_CHARS:
+                return text, None
+            return None, _render(page, dpi, max_edge)
+        finally:
+            page.close()
+
+
+def iter_pages(file, dpi=PDF_RENDER_DPI, max_pages=PDF_MAX_PAGES,
+               max_edge=OCR_MAX_EDGE, quality=OCR_JPEG_QUALITY):
+    """Yield (index, page_count, text, image) for each page, in order.
+
+    text is the page's own text layer, or None for a scanned page, which
+    then comes with image as JPEG bytes to OCR. Consume each generator
+    from one thread; several can run at once.
+    """
+    with _pdfium_lock:
+        try:
+            document = pdfium.PdfDocument(file)
+        except pdfium.PdfiumError as e:
+            raise PdfError(f"Could not open the PDF ({e})")
+        page_count = len(document)
+
+    try:
+        if page_count > max_pages:
+            raise PdfError(f"PDF has {page_count} pages (limit {max_pages})")
+        for index in range(page_count):
+            text, image = _read_page(document, index, dpi, max_edge)
+            if text is not None:
+                yield index, page_count, text, None
+                continue
+            # Encoding doesn't touch pdfium, so it runs outside the lock
+            output = io.BytesIO()
+            image.save(output, format='JPEG', quality=quality, optimize=True)
+            yield index, page_count, None, output.getvalue()
+    finally:
+        with _pdfium_lock:
+            document.close()
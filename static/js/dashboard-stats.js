@@ -6,19 +6,43 @@ document.addEventListener('DOMContentLoaded', function() {
     window.switchView = switchView;
     window.changeYear = changeYear;
     window.loadMonthData = loadMonthData;
+    window.loadBootstrap = loadBootstrap;  // upload.js calls this after a save
     
-    // Initialize
-    loadAvailableYears();
-    
-    // Set default view
-    setTimeout(() => {
-        switchView('yearly');
-    }, 500);
+    // Initialize: years, months, summary and month details in one request
+    loadBootstrap();
 });
 
 let currentView = 'yearly';
 let selectedYear = '';
 let selectedMonth = '';
+let bootstrap = null;  // Last /api/dashboard-bootstrap response
+let yearSummaries = {};  // /api/financial-summary responses since then, by year
+
+// ========== LOAD DASHBOARD BOOTSTRAP ==========
+async function loadBootstrap() {
+    try {
+        console.log('📡 Fetching dashboard bootstrap...');
+        
+        let url = '/api/dashboard-bootstrap';
+        if (selectedYear) {
+            url += `?year=${encodeURIComponent(selectedYear)}`;
+        }
+        
+        const response = await fetch(url);
+        const data = await response.json();
+        console.log('📦 Bootstrap Received:', data);
+        
+        if (data.success) {
+            bootstrap = data;
+            yearSummaries = {};
+            renderYears(data.years);
+            // Renders from the bootstrap just stored; never fetches it again
+            switchView(currentView);
+        }
+    } catch (error) {
+        console.error('❌ Error loading dashboard:', error);
+    }
+}
 
 // ========== VIEW SWITCHING ==========
 function switchView(view) {
@@ -73,136 +97,126 @@ function changeYear(year) {
     }
 }
 
-// ========== LOAD AVAILABLE YEARS ==========
-async function loadAvailableYears() {
-    try {
-        console.log('📡 Fetching available years...');
-        const response = await fetch('/api/financial-years');
-        const data = await response.json();
-        console.log('📅 Years API Response:', data);
-        
-        const yearSelect = document.getElementById('yearSelector');
-        if (!yearSelect) {
-            console.error('❌ Year selector not found!');
-            return;
-        }
-        
-        yearSelect.innerHTML = '<option value="">All Financial Years</option>';
+// ========== RENDER AVAILABLE YEARS ==========
+function renderYears(years) {
+    console.log('📅 Years:', years);
+    
+    const yearSelect = document.getElementById('yearSelector');
+    if (!yearSelect) {
+        console.error('❌ Year selector not found!');
+        return;
+    }
+    
+    yearSelect.innerHTML = '<option value="">All Financial Years</option>';
+    
+    if (years && years.length > 0) {
+        // Newest first (the API already sends them in this order)
+        const sortedYears = [...years].sort((a, b) => b.localeCompare(a));
+        console.log('✅ Years loaded:', sortedYears);
         
-        if (data.success && data.years && data.years.length > 0) {
-            // Sort years in descending order (newest first)
-            const sortedYears = data.years.sort((a, b) => b.localeCompare(a));
-            console.log('✅ Years loaded:', sortedYears);
-            
-            sortedYears.forEach(year => {
-                const option = document.createElement('option');
-                option.value = year;
-                option.textContent = `FY ${year}`;
-                yearSelect.appendChild(option);
-            });
-        } else {
-            console.log('⚠️ No years found in database');
-            // Add a placeholder option
+        sortedYears.forEach(year => {
             const option = document.createElement('option');
-            option.value = "";
-            option.disabled = true;
-            option.textContent = "No years available";
+            option.value = year;
+            option.textContent = `FY ${year}`;
             yearSelect.appendChild(option);
-        }
-    } catch (error) {
-        console.error('❌ Error loading years:', error);
+        });
+        
+        // Keep the current choice when the dashboard is refreshed
+        yearSelect.value = selectedYear;
+    } else {
+        console.log('⚠️ No years found in database');
+        // Add a placeholder option
+        const option = document.createElement('option');
+        option.value = "";
+        option.disabled = true;
+        option.textContent = "No years available";
+        yearSelect.appendChild(option);
     }
 }
 
 // ========== LOAD MONTHS FOR SELECTED YEAR ==========
-async function loadMonthsForYear(year) {
-    try {
-        console.log('📆 Loading months for year:', year);
-        
-        const response = await fetch('/api/months-list');
-        const data = await response.json();
-        console.log('📅 Months API Response:', data);
-        
-        const monthSelect = document.getElementById('monthSelect');
-        if (!monthSelect) {
-            console.error('❌ Month selector not found!');
-            return;
-        }
-        
-        monthSelect.innerHTML = '<option value="">Select a month</option>';
-        
-        if (data.success && data.months && data.months.length > 0) {
-            // Filter months that belong to the selected financial year
-            const monthsForYear = data.months.filter(month => {
-                const parts = month.split(' ');
-                if (parts.length === 2) {
-                    const monthName = parts[0];
-                    const monthYear = parseInt(parts[1]);
-                    
-                    const months = {
-                        'January': 1, 'February': 2, 'March': 3, 'April': 4,
-                        'May': 5, 'June': 6, 'July': 7, 'August': 8,
-                        'September': 9, 'October': 10, 'November': 11, 'December': 12
-                    };
-                    const monthNum = months[monthName];
-                    
-                    // Calculate financial year for this month
-                    let monthFY;
-                    if (monthNum >= 4) {
-                        monthFY = `${monthYear}-${(monthYear + 1).toString().slice(-2)}`;
-                    } else {
-                        monthFY = `${monthYear - 1}-${monthYear.toString().slice(-2)}`;
-                    }
-                    
-                    return monthFY === year;
-                }
-                return false;
-            });
-            
-            console.log(`📊 Found ${monthsForYear.length} months for FY ${year}:`, monthsForYear);
-            
-            // Sort months chronologically (newest first)
-            monthsForYear.sort((a, b) => {
-                const [monthA, yearA] = a.split(' ');
-                const [monthB, yearB] = b.split(' ');
-                
-                if (yearA !== yearB) return parseInt(yearB) - parseInt(yearA);
+function loadMonthsForYear(year) {
+    console.log('📆 Loading months for year:', year);
+    
+    const monthSelect = document.getElementById('monthSelect');
+    if (!monthSelect) {
+        console.error('❌ Month selector not found!');
+        return;
+    }
+    
+    monthSelect.innerHTML = '<option value="">Select a month</option>';
+    
+    // Already in date order from the bootstrap response
+    const allMonths = bootstrap ? bootstrap.months : [];
+    
+    if (allMonths.length > 0) {
+        // Filter months that belong to the selected financial year
+        const monthsForYear = allMonths.filter(month => {
+            const parts = month.split(' ');
+            if (parts.length === 2) {
+                const monthName = parts[0];
+                const monthYear = parseInt(parts[1]);
                 
                 const months = {
                     'January': 1, 'February': 2, 'March': 3, 'April': 4,
                     'May': 5, 'June': 6, 'July': 7, 'August': 8,
                     'September': 9, 'October': 10, 'November': 11, 'December': 12
                 };
-                return months[monthB] - months[monthA];
-            });
-            
-            // Add months to dropdown
-            monthsForYear.forEach(month => {
-                const option = document.createElement('option');
-                option.value = month;
-                option.textContent = month;
-                monthSelect.appendChild(option);
-            });
-            
-            // If there was a previously selected month that's still valid, select it
-            if (selectedMonth && monthsForYear.includes(selectedMonth)) {
-                monthSelect.value = selectedMonth;
-                loadMonthData(selectedMonth);
+                const monthNum = months[monthName];
+                
+                // Calculate financial year for this month
+                let monthFY;
+                if (monthNum >= 4) {
+                    monthFY = `${monthYear}-${(monthYear + 1).toString().slice(-2)}`;
+                } else {
+                    monthFY = `${monthYear - 1}-${monthYear.toString().slice(-2)}`;
+                }
+                
+                return monthFY === year;
             }
-        } else {
-            console.log('⚠️ No months found in database');
-            monthSelect.innerHTML = '<option value="">No months available</option>';
+            return false;
+        });
+        
+        console.log(`📊 Found ${monthsForYear.length} months for FY ${year}:`, monthsForYear);
+        
+        // Newest first
+        monthsForYear.reverse();
+        
+        // Add months to dropdown
+        monthsForYear.forEach(month => {
+            const option = document.createElement('option');
+            option.value = month;
+            option.textContent = month;
+            monthSelect.appendChild(option);
+        });
+        
+        // If there was a previously selected month that's still valid, select it
+        if (selectedMonth && monthsForYear.includes(selectedMonth)) {
+            monthSelect.value = selectedMonth;
+            loadMonthData(selectedMonth);
         }
-    } catch (error) {
-        console.error('❌ Error loading months:', error);
+    } else {
+        console.log('⚠️ No months found in database');
+        monthSelect.innerHTML = '<option value="">No months available</option>';
     }
 }
 
 // ========== LOAD DASHBOARD DATA (Yearly View) ==========
 async function loadDashboardData() {
     try {
+        // The bootstrap response already has the summary for the year it was loaded with
+        if (bootstrap && bootstrap.year === selectedYear) {
+            renderSummary(bootstrap);
+            return;
+        }
+        if (yearSummaries[selectedYear]) {
+            renderSummary(yearSummaries[selectedYear]);
+            return;
+        }
+        
         console.log('📡 Fetching dashboard data...');
         
+        const year = selectedYear;  // The user may pick another while this loads
         let url = '/api/financial-summary';
         if (selectedYear) {
             url += `?year=${selectedYear}`;
@@ -214,64 +228,75 @@ async function loadDashboardData() {
         console.log('📦 Dashboard Data Received:', data);
         
         if (data.success) {
-            // Update stats cards
-            document.getElementById('totalIncome').textContent = formatCurrency(data.summary.totalIncome || 0);
-            document.getElementById('totalTax').textContent = formatCurrency(data.summary.totalTax || 0);
-            document.getElementById('taxSaved').textContent = formatCurrency(data.summary.taxSaved || 0);
-            document.getElementById('monthsTracked').textContent = (data.summary.monthsTracked || 0) + '/12';
-            
-            // Clear existing charts safely
-            clearCharts();
-            
-            // Create new charts if data exists
-            if (data.monthlyData && data.monthlyData.months && data.monthlyData.months.length > 0) {
-                setTimeout(() => createCharts(data.monthlyData), 100);
-            }
-            
-            // ===== THIS IS THE KEY PART =====
-            // Update savings with new data for selected year
-            if (data.savings) {
-                console.log('💰 Updating savings for year:', selectedYear, data.savings);
-                updateSavings(data.savings);  // This updates the progress bars
-            }
-            
-            // Update tip
-            updateSavingsTip();
+            yearSummaries[year] = data;
+            renderSummary(data);
         }
     } catch (error) {
         console.error('❌ Error loading dashboard data:', error);
     }
 }
 
+function renderSummary(data) {
+    // Update stats cards
+    document.getElementById('totalIncome').textContent = formatCurrency(data.summary.totalIncome || 0);
+    document.getElementById('totalTax').textContent = formatCurrency(data.summary.totalTax || 0);
+    document.getElementById('taxSaved').textContent = formatCurrency(data.summary.taxSaved || 0);
+    document.getElementById('monthsTracked').textContent = (data.summary.monthsTracked || 0) + '/12';
+    
+    // Clear existing charts safely
+    clearCharts();
+    
+    // Create new charts if data exists
+    if (data.monthlyData && data.monthlyData.months && data.monthlyData.months.length > 0) {
+        setTimeout(() => createCharts(data.monthlyData), 100);
+    }
+    
+    // ===== THIS IS THE KEY PART =====
+    // Update savings with new data for selected year
+    if (data.savings) {
+        console.log('💰 Updating savings for year:', selectedYear, data.savings);
+        updateSavings(data.savings);  // This updates the progress bars
+    }
+    
+    // Update tip
+    updateSavingsTip();
+}
+
 // ========== LOAD MONTH DATA (Monthly View) ==========
 async function loadMonthData(month) {
     if (!month) return;
     
     selectedMonth = month;
-    console.log('📡 Fetching month data for:', month);
+    console.log('📡 Loading month data for:', month);
     
     try {
-        const response = await fetch(`/api/monthly-data/${encodeURIComponent(month)}`);
-        const data = await response.json();
-        console.log('📦 Month Data Received:', data);
+        // Every saved month comes with the bootstrap response
+        let monthData = bootstrap ? bootstrap.monthDetails[month] : null;
+        
+        if (!monthData) {
+            const response = await fetch(`/api/monthly-data/${encodeURIComponent(month)}`);
+            const data = await response.json();
+            console.log('📦 Month Data Received:', data);
+            monthData = data.success ? data.data : null;
+        }
         
-        if (data.success && data.data) {
+        if (monthData) {
             // Update stats
-            document.getElementById('totalIncome').textContent = formatCurrency(data.data.income || 0);
-            document.getElementById('totalTax').textContent = formatCurrency(data.data.tax_paid || 0);
+            document.getElementById('totalIncome').textContent = formatCurrency(monthData.income || 0);
+            document.getElementById('totalTax').textContent = formatCurrency(monthData.tax_paid || 0);
             
             // Calculate tax saved from tax_analysis if available
             let taxSaved = 0;
             let month_80c = 0;
             let month_80d = 0;
             
-            if (data.data.tax_analysis && data.data.tax_analysis.answers) {
-                const answers = data.data.tax_analysis.answers;
+            if (monthData.tax_analysis && monthData.tax_analysis.answers) {
+                const answers = monthData.tax_analysis.answers;
                 month_80c = (answers.ppf || 0) + (answers.elss || 0);
                 month_80d = answers.insurance || 0;
                 
-                if (data.data.tax_analysis.results) {
-                    taxSaved = data.data.tax_analysis.results.total_refund || 0;
+                if (monthData.tax_analysis.results) {
+                    taxSaved = monthData.tax_analysis.results.total_refund || 0;
                 }
             }
             
@@ -282,7 +307,7 @@ async function loadMonthData(month) {
             clearCharts();
             
             // Create single month charts
-            setTimeout(() => createSingleMonthCharts(data.data, month), 100);
+            setTimeout(() => createSingleMonthCharts(monthData, month), 100);
             
             // Update savings for this month
             const monthSavings = {
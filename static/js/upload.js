@@ -293,6 +293,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         console.log('Resetting upload');
         
+        cancelAnalysis();
         selectedFile = null;
         selectedFileData = null;
         currentExtractedData = null;
@@ -340,6 +341,45 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 100);
     }
     
+    // Submit the file as an OCR job and poll until it finishes.
+    // Resolves to { success, data, error } like /analyze-payslip did.
+    let currentJobId = null;
+    
+    async function analyzePayslip(file, onProgress) {
+        // Sent as the file itself, not a base64 string
+        const formData = new FormData();
+        formData.append('file', file);
+        const submit = await fetch('/api/ocr-jobs', {
+            method: 'POST',
+            body: formData
+        });
+        let job = await submit.json();
+        if (!job.success) return job;
+        
+        currentJobId = job.job_id;
+        try {
+            while (job.status === 'queued' || job.status === 'running') {
+                if (onProgress) onProgress(job);
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const poll = await fetch(`/api/ocr-jobs/${job.job_id}`);
+                job = await poll.json();
+                if (!job.success) return job;
+            }
+        } finally {
+            currentJobId = null;
+        }
+        
+        if (job.status === 'done') return { success: true, ...job.result };
+        if (job.status === 'cancelled') return { success: false, error: 'Analysis cancelled' };
+        return { success: false, error: job.error };
+    }
+    
+    function cancelAnalysis() {
+        if (!currentJobId) return;
+        fetch(`/api/ocr-jobs/${currentJobId}`, { method: 'DELETE' }).catch(() => {});
+        currentJobId = null;
+    }
+    
     analyzeBtn.addEventListener('click', async () => {
         if (!selectedFile || !selectedFileData) return;
         
@@ -353,19 +393,24 @@ document.addEventListener('DOMContentLoaded', function() {
         progressFill.style.width = '0%';
         
         try {
-            const response = await fetch('/analyze-payslip', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ image: selectedFileData })
+            const result = await analyzePayslip(selectedFile, (job) => {
+                const { done, total } = job.progress || {};
+                if (total) {
+                    // Multi-page PDF: pages read so far
+                    progressFill.style.width = `${Math.max(10, Math.round(done / total * 100))}%`;
+                } else {
+                    progressFill.style.width = job.status === 'running' ? '50%' : '10%';
+                }
             });
             
-            const result = await response.json();
-            
             progressFill.style.width = '100%';
             
             if (result.success) {
                 currentExtractedData = result.data;
                 showResults(result.data);
+                if (result.records && result.records.length > 1) {
+                    offerSaveAllMonths(result.records);
+                }
             } else {
                 alert('Analysis failed: ' + (result.error || 'Unknown error'));
             }
@@ -384,6 +429,36 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    // A PDF with several months: save them all in one request, or review
+    // the first one shown on screen as usual
+    async function offerSaveAllMonths(records) {
+        const months = records.map(record => record.month || 'unknown month');
+        if (!confirm(`Found ${records.length} months in this PDF (${months.join(', ')}).\nSave all of them now?`)) {
+            return;
+        }
+        
+        try {
+            const response = await fetch('/api/save-monthly-data/bulk', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ months: records })
+            });
+            const result = await response.json();
+            
+            if (result.success) {
+                alert(`✅ Saved ${result.saved} of ${records.length} months. Check your dashboard.`);
+                if (typeof window.loadBootstrap === 'function') {
+                    window.loadBootstrap();
+                }
+            } else {
+                alert('❌ Error saving data: ' + (result.error || 'No months could be saved'));
+            }
+        } catch (error) {
+            console.error('Error saving months:', error);
+            alert('❌ Network error while saving. Please try again.');
+        }
+    }
+    
     function showResults(data) {
         const sections = document.querySelectorAll('.section');
         const resultsSection = sections[1];
@@ -502,8 +577,8 @@ document.addEventListener('DOMContentLoaded', function() {
                     alert('✅ Data saved successfully! Check your dashboard.');
                     
                     // Optionally refresh dashboard data if it's visible
-                    if (typeof window.loadDashboardData === 'function') {
-                        window.loadDashboardData();
+                    if (typeof window.loadBootstrap === 'function') {
+                        window.loadBootstrap();
                     }
                 } else {
                     alert('❌ Error saving data: ' + (result.error || 'Unknown error'));
@@ -540,13 +615,7 @@ document.addEventListener('DOMContentLoaded', function() {
             `;
             
             try {
-                const response = await fetch('/analyze-payslip', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ image: selectedFileData })
-                });
-                
-                const result = await response.json();
+                const result = await analyzePayslip(selectedFile);
                 
                 if (result.success) {
                     currentExtractedData = result.data;
@@ -0,0 +1,191 @@
+"""Financial summary maths shared by the dashboard API and the storage layer.
+
+Each saved month is reduced to a small "contribution" (income, TDS, PF
+split, 80C/80D investments, refunds). The database keeps these per user
+and financial year, updating one month at a time, so the dashboard
+summary is built from at most a few dozen numbers instead of re-reading
+every month the user has ever saved.
+"""
+from fiscal_calendar import financial_year as calculate_financial_year, sort_months
+
+
+def safe_float(value):
+    """Safely convert any value to float"""
+    try:
+        if value is None:
+            return 0.0
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            value = value.replace(',', '').strip()
+            return float(value) if value else 0.0
+        return 0.0
+    except (ValueError, TypeError, AttributeError):
+        return 0.0
+
+
+def calculate_trend(incomes):
+    """Calculate percentage trend in income"""
+    if len(incomes) < 2:
+        return 0
+    first_avg = sum(incomes[:3]) / min(3, len(incomes))
+    last_avg = sum(incomes[-3:]) / min(3, len(incomes))
+    if first_avg == 0:
+        return 0
+    return round(((last_avg - first_avg) / first_avg) * 100)
+
+
+def month_financial_year(month_key, data):
+    """The FY a saved month counts towards"""
+    return data.get('financial_year') or calculate_financial_year(month_key)
+
+
+def month_contribution(data):
+    """Reduce one month's saved data to the numbers the summary adds up"""
+    income = safe_float(data.get('income', 0))
+    deductions = safe_float(data.get('deductions', 0))
+
+    contribution = {
+        "income": income,
+        "net_pay": safe_float(data.get('net_pay', 0)),
+        "tds": safe_float(data.get('tax_paid', 0)),
+        "pf": deductions * 0.6 if deductions > 0 else 0.0,
+        "other": deductions * 0.4 if deductions > 0 else 0.0,
+        "inv_80c": 0.0,
+        "inv_80d": 0.0,
+        "hra": 0.0,
+        "refund": 0.0
+    }
+
+    # Investment data from tax_analysis.answers (user inputs in the analyzer)
+    if 'tax_analysis' in data and 'answers' in data['tax_analysis']:
+        answers = data['tax_analysis']['answers']
+        contribution["inv_80c"] = safe_float(answers.get('ppf', 0)) + safe_float(answers.get('elss', 0))
+        contribution["inv_80d"] = safe_float(answers.get('insurance', 0))
+
+        if 'results' in data['tax_analysis']:
+            results = data['tax_analysis']['results']
+            contribution["hra"] = safe_float(results.get('hra', 0))
+            contribution["refund"] = safe_float(results.get('total_refund', 0))
+
+    # Fallback to old investments structure if no tax_analysis
+    else:
+        investments = data.get('investments', {})
+        contribution["inv_80c"] = (safe_float(investments.get('ppf', 0)) +
+                                   safe_float(investments.get('elss', 0)) +
+                                   safe_float(investments.get('life_insurance', 0)))
+
+        insurance = data.get('insurance', {})
+        contribution["inv_80d"] = (safe_float(insurance.get('self', 0)) +
+                                   safe_float(insurance.get('parents', 0)))
+
+    return contribution
+
+
+def fy_contributions(monthly_data):
+    """{month: data} -> {financial_year: {month: contribution}}
+    
+    Months whose key has no financial year are grouped under '', so they
+    only show up in the all-years summary, as before.
+    """
+    aggregates = {}
+    for month_key, data in monthly_data.items():
+        fy = month_financial_year(month_key, data) or ''
+        aggregates.setdefault(fy, {})[month_key] = month_contribution(data)
+    return aggregates
+
+
+def empty_summary():
+    """Dashboard response body for a user with no saved months"""
+    return {
+        "summary": {
+            "totalIncome": 0,
+            "totalTax": 0,
+            "taxSaved": 0,
+            "monthsTracked": 0,
+            "trend": 0
+        },
+        "monthlyData": {
+            "months": [],
+            "incomes": [],
+            "takeHome": 0,
+            "tds": 0,
+            "pf": 0,
+            "otherDeductions": 0
+        },
+        "savings": {
+            "invested80C": 0,
+            "invested80D": 0
+        }
+    }
+
+
+def build_summary(contributions):
+    """Dashboard response body from {month: contribution}, months in date order"""
+    months_list = sort_months(contributions)
+
+    incomes_list = []
+    total_take_home = 0
+    total_tds = 0
+    total_pf = 0
+    total_other = 0
+    total_80c_investment = 0  # Actual PPF + ELSS invested
+    total_80d_investment = 0  # Actual Insurance premium paid
+    total_tax_saved = 0       # Total refund from tax_analysis
+    total_hra_benefit = 0     # HRA refund amount
+
+    for month_key in months_list:
+        contribution = contributions[month_key]
+        incomes_list.append(contribution["income"])
+        total_take_home += contribution["net_pay"]
+        total_tds += contribution["tds"]
+        total_pf += contribution["pf"]
+        total_other += contribution["other"]
+        total_80c_investment += contribution["inv_80c"]
+        total_80d_investment += contribution["inv_80d"]
+        total_hra_benefit += contribution["hra"]
+        total_tax_saved += contribution["refund"]
+
+    # If no tax_analysis data found, estimate tax saved
+    if total_tax_saved == 0:
+        total_tax_saved = (total_80c_investment * 0.3) + (total_80d_investment * 0.3) + total_hra_benefit
+
+    # REFUND amounts (30% of investments) - matching calculate_tax_refund
+    refund_80c = total_80c_investment * 0.3
+    refund_80d = total_80d_investment * 0.3
+
+    return {
+        "summary": {
+            "totalIncome": sum(incomes_list),
+            "totalTax": total_tds,
+            "taxSaved": total_tax_saved,
+            "monthsTracked": len(months_list),
+            "trend": calculate_trend(incomes_list) if len(incomes_list) > 1 else 0
+        },
+        "monthlyData": {
+            "months": months_list,
+            "incomes": incomes_list,
+            "takeHome": total_take_home,
+            "tds": total_tds,
+            "pf": total_pf,
+            "otherDeductions": total_other
+        },
+        "savings": {
+            "invested80C": total_80c_investment,  # Investment amount (for display)
+            "invested80D": total_80d_investment,  # Investment amount (for display)
+            "refund80C": refund_80c,              # Refund amount (for progress bar)
+            "refund80D": refund_80d
+        }
+    }
+
+
+def summary_for_year(aggregates, selected_year=None):
+    """Dashboard response body for one financial year, or all years when none is given"""
+    if not aggregates:
+        return empty_summary()
+
+    contributions = {}
+    for financial_year, months in aggregates.items():
+        if not selected_year or financial_year == selected_year:
+            contributions.update(months)
+    return build_summary(contributions)
@@ -0,0 +1,354 @@
+"""Read an uploaded payslip without holding several copies of it.
+
+The upload pages send the file as multipart/form-data (field 'file'). API
+clients can also send the raw bytes as the request body. Either way the file
+is written once, in chunks, into a SpooledTemporaryFile: memory up to
+UPLOAD_SPOOL_BYTES, a temp file beyond that. For a form, werkzeug's parser
+writes into it directly and the Upload takes it over, so the file isn't
+copied again. The SHA-256 for the OCR cache is computed along the way.
+Bodies over OCR_MAX_UPLOAD_BYTES are refused,
+including chunked ones with no Content-Length: the app uses LimitedRequest,
+so werkzeug stops reading at the limit instead of parsing the whole form
+first. The older JSON body with a base64 data URL is still accepted.
+
+OCR_MAX_UPLOAD_BYTES  largest accepted file (default 10 MB)
+UPLOAD_SPOOL_BYTES    kept in memory before spilling to disk (default 1 MB)
+BATCH_MAX_FILES       payslips in one batch, counting ZIP entries (default 48)
+BATCH_MAX_BYTES       largest batch request, e.g. a ZIP, and most its ZIPs may
+                      unpack to (default 50 MB)
+"""
+import io
+import os
+import base64
+import hashlib
+import zipfile
+import tempfile
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+OCR_MAX_UPLOAD_BYTES = int(os.getenv('OCR_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', str(1024 * 1024)))
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', '48'))
+BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', str(50 * 1024 * 1024)))
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """The request has no usable file; str() is the message for the user"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class HashingSpool(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile that keeps the size and SHA-256 of what is written to it"""
+
+    def __init__(self):
+        super().__init__(max_size=UPLOAD_SPOOL_BYTES)
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return super().write(data)
+
+
+class LimitedRequest(Request):
+    """Flask request whose body limit can be lowered for one request.
+
+    Flask 3.0's max_content_length is the app-wide MAX_CONTENT_LENGTH.
+    read_upload() and read_uploads() set body_limit to their own cap before
+    touching the body, so werkzeug refuses a chunked body as soon as it
+    passes the cap. Form files are parsed into HashingSpools.
+    """
+
+    body_limit = None
+
+    @property
+    def max_content_length(self):
+        if self.body_limit is not None:
+            return self.body_limit
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpool()
+
+
+def json_body_limit(max_bytes=OCR_MAX_UPLOAD_BYTES):
+    """Largest JSON body that can hold a base64 file of max_bytes (base64 adds a third)"""
+    return (max_bytes + 2) // 3 * 4 + CHUNK_SIZE
+
+
+class Upload:
+    """One uploaded file: a seekable binary file, its size and SHA-256"""
+
+    def __init__(self, file, size, sha256, filename=None, content_type=None):
+        self.file = file
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+        self.content_type = content_type
+
+    @classmethod
+    def from_bytes(cls, data, filename=None, content_type=None):
+        return cls(io.BytesIO(data), len(data), hashlib.sha256(data).hexdigest(), filename, content_type)
+
+    def open(self):
+        """The file, rewound"""
+        self.file.seek(0)
+        return self.file
+
+    def read(self):
+        return self.open().read()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def close_uploads(uploads):
+    """Close every Upload in uploads (closing one twice is harmless)"""
+    for upload in uploads:
+        upload.close()
+
+
+def too_large_message(max_bytes=OCR_MAX_UPLOAD_BYTES, what="File is too large"):
+    if max_bytes >= 1024 * 1024:
+        return f"{what} (limit {max_bytes // (1024 * 1024)} MB)"
+    return f"{what} (limit {max_bytes // 1024} KB)"
+
+
+def spool(stream, max_bytes=OCR_MAX_UPLOAD_BYTES, filename=None, content_type=None):
+    """Copy a readable stream into an Upload, hashing as it goes"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadError(too_large_message(max_bytes), 413)
+            digest.update(chunk)
+            spooled.write(chunk)
+    except Exception:
+        spooled.close()
+        raise
+    if size == 0:
+        spooled.close()
+        raise UploadError("No image provided")
+    spooled.seek(0)
+    return Upload(spooled, size, digest.hexdigest(), filename, content_type)
+
+
+def from_form_file(file, max_bytes=OCR_MAX_UPLOAD_BYTES):
+    """A werkzeug FileStorage as an Upload, taking over the file werkzeug parsed it into"""
+    spooled = file.stream
+    if not isinstance(spooled, HashingSpool):
+        # Parsed by a plain Request: copy it
+        return spool(spooled, max_bytes, file.filename, file.mimetype)
+    # Flask closes the request's files when the request ends, and a job may
+    # still be reading this one
+    file.stream = io.BytesIO()
+    if spooled.size > max_bytes or spooled.size == 0:
+        spooled.close()
+        if spooled.size:
+            raise UploadError(too_large_message(max_bytes), 413)
+        raise UploadError("No image provided")
+    spooled.seek(0)
+    return Upload(spooled, spooled.size, spooled.digest.hexdigest(), file.filename, file.mimetype)
+
+
+def read_upload(request, max_bytes=OCR_MAX_UPLOAD_BYTES):
+    """The file in a Flask request as an Upload; raises UploadError.
+
+    The caller owns the Upload and must close() it (a background job may
+    keep it past the end of the request).
+    """
+    mimetype = request.mimetype
+    # The margin covers multipart headers and the JSON envelope
+    body_limit = json_body_limit(max_bytes) if mimetype == 'application/json' else max_bytes + CHUNK_SIZE
+    if request.content_length is not None and request.content_length > body_limit:
+        # Refuse before reading anything
+        raise UploadError(too_large_message(max_bytes), 413)
+    # and stop reading a chunked body once it gets there
+    request.body_limit = body_limit
+
+    try:
+        return _read_upload(request, mimetype, max_bytes)
+    except RequestEntityTooLarge:
+        raise UploadError(too_large_message(max_bytes), 413)
+
+
+def _read_upload(request, mimetype, max_bytes):
+    if mimetype == 'multipart/form-data':
+        file = request.files.get('file')
+        if file is None:
+            raise UploadError("No image provided")
+        return from_form_file(file, max_bytes)
+
+    if mimetype == 'application/json':
+        data = request.get_json(silent=True) or {}
+        image_data = data.get('image')
+        if not image_data:
+            raise UploadError("No image provided")
+        content_type = None
+        if ',' in image_data:
+            header, image_data = image_data.split(',', 1)
+            content_type = header[5:].split(';')[0] if header.startswith('data:') else None
+        try:
+            image_bytes = base64.b64decode(image_data)
+        except ValueError:
+            raise UploadError("Image is not valid base64")
+        if len(image_bytes) > max_bytes:
+            raise UploadError(too_large_message(max_bytes), 413)
+        return Upload.from_bytes(image_bytes, content_type=content_type)
+
+    # Raw body: application/octet-stream, image/*, application/pdf
+    return spool(request.stream, max_bytes, request.headers.get('X-Filename'), mimetype or None)
+
+
+def read_uploads(request, max_files=BATCH_MAX_FILES, max_bytes=BATCH_MAX_BYTES):
+    """Every file in a batch request as Uploads; raises UploadError.
+
+    Files come from multipart field 'files' (or 'file'), or as one raw body
+    such as a ZIP. The caller closes them.
+    """
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise UploadError(too_large_message(max_bytes), 413)
+    request.body_limit = max_bytes + CHUNK_SIZE
+
+    try:
+        if request.mimetype != 'multipart/form-data':
+            return [spool(request.stream, max_bytes, request.headers.get('X-Filename'), request.mimetype or None)]
+        files = request.files.getlist('files') or request.files.getlist('file')
+    except RequestEntityTooLarge:
+        raise UploadError(too_large_message(max_bytes), 413)
+    if not files:
+        raise UploadError("No files provided")
+    if len(files) > max_files:
+        raise UploadError(f"At most {max_files} files per batch")
+
+    uploads = []
+    try:
+        for file in files:
+            # Sized per file later: a ZIP may be up to max_bytes, its contents less
+            uploads.append(from_form_file(file, max_bytes))
+    except Exception:
+        for upload in uploads:
+            upload.close()
+        raise
+    return uploads
+
+
+def is_zip(upload):
+    file = upload.open()
+    signature = file.read(4)
+    file.seek(0)
+    return signature == b'PK\x03\x04'
+
+
+def expand_archives(uploads, max_files=BATCH_MAX_FILES, max_bytes=OCR_MAX_UPLOAD_BYTES,
+                    max_unpacked_bytes=BATCH_MAX_BYTES):
+    """[(name, Upload or UploadError)] with each ZIP replaced by its files.
+
+    A ZIP's entries are counted and sized from its directory before anything
+    is unpacked: too many files refuses the batch, and an entry over
+    max_bytes, or one that would take the batch's ZIPs past
+    max_unpacked_bytes in total, is refused on its own. Entries are then
+    unpacked one at a time through spool() with the same limits, in case the
+    sizes in the directory lie. Folders, hidden files and macOS metadata are
+    skipped. ZIPs and files refused here are closed; the caller closes the
+    Uploads returned.
+    """
+    entries = []
+    unpacked = 0
+    try:
+        for number, upload in enumerate(uploads, 1):
+            name = upload.filename or f"file {number}"
+            if not is_zip(upload):
+                if upload.size > max_bytes:
+                    upload.close()
+                    entries.append((name, UploadError(too_large_message(max_bytes), 413)))
+                else:
+                    entries.append((name, upload))
+            else:
+                with upload:
+                    unzipped, size = _unzip(upload, name, len(entries), max_files, max_bytes,
+                                            unpacked, max_unpacked_bytes)
+                entries.extend(unzipped)
+                unpacked += size
+            if len(entries) > max_files:
+                raise UploadError(f"At most {max_files} files per batch")
+    except Exception:
+        for upload in uploads:
+            upload.close()
+        for _, entry in entries:
+            if isinstance(entry, Upload):
+                entry.close()
+        raise
+    return entries
+
+
+def _is_payslip_entry(info):
+    """False for folders, hidden files and macOS metadata"""
+    base = os.path.basename(info.filename)
+    return not (info.is_dir() or not base or base.startswith('.') or info.filename.startswith('__MACOSX/'))
+
+
+def _unzip(upload, name, files, max_files, max_bytes, unpacked_before, max_unpacked_bytes):
+    """(entries, bytes unpacked) for one ZIP, given the files and unpacked bytes
+    the batch already has"""
+    try:
+        archive = zipfile.ZipFile(upload.open())
+    except zipfile.BadZipFile:
+        return [(name, UploadError("Not a readable ZIP file"))], 0
+
+    entries = []
+    unpacked = 0
+    budget = max_unpacked_bytes - unpacked_before
+    over_budget = too_large_message(max_unpacked_bytes, "ZIP files unpack to too much")
+    try:
+        with archive:
+            members = [info for info in archive.infolist() if _is_payslip_entry(info)]
+            if files + len(members) > max_files:
+                raise UploadError(f"At most {max_files} files per batch")
+            for info in members:
+                entry_name = f"{name}/{info.filename}"
+                if info.file_size > max_bytes:
+                    entries.append((entry_name, UploadError(too_large_message(max_bytes), 413)))
+                    continue
+                if info.file_size > budget - unpacked:
+                    entries.append((entry_name, UploadError(over_budget, 413)))
+                    continue
+                limit = min(max_bytes, budget - unpacked)
+                try:
+                    with archive.open(info) as member:
+                        entry = spool(member, limit, os.path.basename(info.filename))
+                except UploadError as e:
+                    if e.status == 413 and limit < max_bytes:
+                        e = UploadError(over_budget, 413)
+                    entries.append((entry_name, e))
+                    continue
+                except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                    # Corrupt, encrypted or an unsupported compression method
+                    entries.append((entry_name, UploadError(f"Could not unpack ({e})")))
+                    continue
+                unpacked += entry.size
+                entries.append((entry_name, entry))
+    except Exception:
+        for _, entry in entries:
+            if isinstance(entry, Upload):
+                entry.close()
+        raise
+    return entries, unpacked